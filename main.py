@@ -36,25 +36,9 @@ async def run_react_pipeline():
             print("CHI TIẾT CÁC BƯỚC:")
             print("="*70)
             
-            if pipeline_output_data.get('task1_output'):
-                task1 = pipeline_output_data.get('task1_output')
-                print(f"\nTask 1 ({task1.get('agent')}):")
-                print(f"   {task1.get('output')}")
-            
-            if pipeline_output_data.get('task2_output'):
-                task2 = pipeline_output_data.get('task2_output')
-                print(f"\nTask 2 ({task2.get('agent')}):")
-                print(f"   {task2.get('output')}")
-            
-            if pipeline_output_data.get('task3_output'):
-                task3 = pipeline_output_data.get('task3_output')
-                print(f"\nTask 3 ({task3.get('agent')}):")
-                print(f"   {task3.get('output')}")
-            
-            if pipeline_output_data.get('task4_output'):
-                task4 = pipeline_output_data.get('task4_output')
-                print(f"\nTask 4 ({task4.get('agent')}):")
-                print(f"   {task4.get('output')}")
+            for idx, output in enumerate(pipeline_output_data.get('agent_outputs') or (), 1):
+                print(f"\nTask {idx} ({output.agent}):")
+                print(f"   {output.output}")
             
             print(f"\nSession ID: {pipeline_output_data.get('session_id')}")
         else:
@@ -119,8 +103,8 @@ async def run_a2a_pipeline():
             print(f"\n{'='*80}")
             print(f"AGENT INTERACTION TRACE")
             for output in result['agent_outputs']:
-                print(f"\n[{output['agent'].upper()}]")
-                print(f"{output['output']}")
+                print(f"\n[{output.agent.upper()}]")
+                print(f"{output.output}")
             
             await asyncio.sleep(2)
             
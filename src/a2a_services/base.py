@@ -3,6 +3,7 @@ from functools import lru_cache
 from google.adk.models.lite_llm import LiteLlm
 
 from src.config.settings import api_config
+from src.utils.http_client import install_litellm_client
 
 
 @lru_cache(maxsize=1)
@@ -11,6 +12,7 @@ def build_llm_client(model: str | None = None) -> LiteLlm:
         Shared utilities for remote A2A microservices.
         Create (and cache) a LiteLlm client configured via environment settings.
     """
+    install_litellm_client()
     return LiteLlm(
         model=model or api_config.llm_model,
         api_base=api_config.base_url_llm,
@@ -1,4 +1,5 @@
 """Agents with ReAct pattern for manual tool calling."""
+from google.genai import types
 from google.adk.agents import Agent
 from google.adk.planners import PlanReActPlanner
 
@@ -22,15 +23,18 @@ Dựa trên phân tích, hãy chuẩn bị một bản tóm tắt rõ ràng dạ
 - original_query: (string) câu hỏi gốc
 - requires_inventory_check: (boolean) có cần kiểm tra kho không
 - requires_order_placement: (boolean) khách có ý định đặt hàng không
+- depends_on_inventory: (boolean) việc tạo đơn có cần giá/tồn kho từ bước kiểm tra kho không (mặc định true)
 
 CHÚ Ý:
 - Phản hồi của bạn PHẢI là một đối tượng JSON thuần túy, KHÔNG bao gồm bất kỳ định dạng markdown nào như ```json hoặc ```. 
 - Chỉ trả về đối tượng JSON với các trường như mô tả, không thêm văn bản trước hoặc sau JSON.
 
 Ví dụ output:
-{"product_details": "iPhone 15 Pro Max 256GB màu Titan tự nhiên", "customer_intent": "place_order", "original_query": "Tôi muốn mua iPhone 15 Pro Max", "requires_inventory_check": true, "requires_order_placement": true}
+{"product_details": "iPhone 15 Pro Max 256GB màu Titan tự nhiên", "customer_intent": "place_order", "original_query": "Tôi muốn mua iPhone 15 Pro Max", "requires_inventory_check": true, "requires_order_placement": true, "depends_on_inventory": true}
             """,
-            planner=self.planner
+            planner=self.planner,
+            # Structured output: deterministic so identical prompts give identical answers
+            generate_content_config=types.GenerateContentConfig(temperature=0)
     )
 
 
@@ -76,7 +80,9 @@ Input lần 2: "Tool result: {"status": "success", "products": [{"product": "iPh
 Response lần 2 (final answer):
 {"product_name": "iPhone 15 Pro Max", "storage": "256GB", "color": "Titan tự nhiên", "stock_status": "in_stock", "price": 27990000, "quantity": 3}
             """,
-            planner=self.planner
+            planner=self.planner,
+            # Structured output: deterministic so identical prompts give identical answers
+            generate_content_config=types.GenerateContentConfig(temperature=0)
         )
     
     def get_tools(self):
@@ -127,7 +133,9 @@ Input lần 2: "Tool result: Order saved successfully"
 Response lần 2:
 {"order_created": true, "order_details": {"order_id": "order_1699171234", "product": "iPhone 15 Pro Max", "color": "Black", "storage": "256GB", "quantity": 1, "total_price": 27990000}, "customer_info": {"customer_name": "Nguyễn A", "conversation_id": "conv_001"}, "message": "Đơn hàng đã được tạo thành công"}
             """,
-            planner=self.planner
+            planner=self.planner,
+            # Structured output: deterministic so identical prompts give identical answers
+            generate_content_config=types.GenerateContentConfig(temperature=0)
         )
     
     def get_tools(self):
@@ -1,6 +1,6 @@
 from enum import Enum
-from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, NamedTuple
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class CustomerIntent(str, Enum):
@@ -20,6 +20,12 @@ class StockStatus(str, Enum):
 
 
 # ==================== Analysis Agent Schemas ====================
+class AgentOutput(NamedTuple):
+    """Raw output of one pipeline step, in execution order."""
+    agent: str
+    output: str
+
+
 class AnalysisResult(BaseModel):
     """Structured analysis result."""
     product_details: str = Field(
@@ -39,6 +45,25 @@ class AnalysisResult(BaseModel):
         default=False,
         description="Khách có ý định đặt hàng không"
     )
+    depends_on_inventory: bool = Field(
+        default=True,
+        description="Tạo đơn có cần kết quả kiểm tra kho (giá, tồn kho) không"
+    )
+
+class AnalysisSchema(BaseModel):
+    """Routing flags the pipeline needs from the Analysis Agent output."""
+    model_config = ConfigDict(extra="allow")
+
+    requires_inventory_check: bool = Field(
+        description="Có cần kiểm tra kho/giá không"
+    )
+    requires_order_placement: bool = Field(
+        description="Khách có ý định đặt hàng không"
+    )
+    depends_on_inventory: bool = Field(
+        default=True,
+        description="Tạo đơn có cần kết quả kiểm tra kho (giá, tồn kho) không"
+    )
 
 class AnalysisOutput(BaseModel):
     """Output schema for Analysis Agent."""
@@ -192,6 +217,21 @@ class ChatRequest(BaseModel):
         description="Session identifier (auto-generated if not provided)"
     )
 
+class ChatBatchRequest(BaseModel):
+    """Batch chat request schema for API."""
+    requests: List[ChatRequest] = Field(
+        ...,
+        description="Chat requests to process",
+        min_length=1,
+        max_length=100
+    )
+    max_concurrency: int = Field(
+        8,
+        description="Maximum number of requests processed at the same time",
+        ge=1,
+        le=32
+    )
+
 class ChatResponse(BaseModel):
     """Chat response schema for API."""
     customer_response: str = Field(
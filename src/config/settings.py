@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -19,6 +20,11 @@ class APIConfig(BaseSettings):
         description="Large Language model name to be used (e.g., GPT-4)",
         alias="LLM_MODEL",
     )
+    redis_url: Optional[str] = Field(
+        default=None,
+        description="Redis URL for shared agent sessions (in-memory sessions when unset)",
+        alias="REDIS_URL",
+    )
 
 class LLMConfig(BaseSettings):
     gemini_api_key: str = Field(
@@ -58,6 +64,39 @@ class MCPConfig(BaseSettings):
     )
 
 
+class CacheConfig(BaseSettings):
+    analysis_cache_ttl: int = Field(
+        default=600,
+        description="Seconds an analysis result stays cached per normalized query (0 disables the cache)",
+        alias="ANALYSIS_CACHE_TTL",
+    )
+    agent_cache_ttl: int = Field(
+        default=120,
+        description="Seconds a deterministic agent output stays cached per prompt (0 disables the cache)",
+        alias="AGENT_CACHE_TTL",
+    )
+    response_cache_ttl: int = Field(
+        default=0,
+        description="Seconds a /chat response stays cached per conversation (0, the default, disables the cache)",
+        alias="RESPONSE_CACHE_TTL",
+    )
+    semantic_cache_enabled: bool = Field(
+        default=False,
+        description="Reuse consultant answers for paraphrased queries (needs sentence-transformers)",
+        alias="SEMANTIC_CACHE_ENABLED",
+    )
+    semantic_cache_model: str = Field(
+        default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        description="Embedding model used by the semantic cache",
+        alias="SEMANTIC_CACHE_MODEL",
+    )
+    semantic_cache_threshold: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity for a semantic cache hit",
+        alias="SEMANTIC_CACHE_THRESHOLD",
+    )
+
+
 class MongodbConfig(BaseSettings):
     mongo_uri: str = Field(
         default="mongodb://localhost:27017",
@@ -113,4 +152,5 @@ api_config = APIConfig()
 llm_config = LLMConfig()
 mcp_config = MCPConfig()
 db_config = MongodbConfig()
+cache_config = CacheConfig()
 a2a_service_config = A2AServiceConfig()
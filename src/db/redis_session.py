@@ -0,0 +1,130 @@
+import time
+import uuid
+from loguru import logger
+from typing import Any, Dict, Optional
+from google.adk.events import Event
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+class RedisSessionService(BaseSessionService):
+    """
+    ADK session service backed by Redis, so several API workers share sessions.
+
+    Each session is stored as one JSON blob under
+    `adk:sess:{app_name}:{user_id}:{session_id}` and expires `ttl_seconds`
+    after its last update. `app:`/`user:` state keys are kept on the session
+    itself rather than shared across sessions.
+    """
+
+    def __init__(self, redis_url: str, ttl_seconds: int = 3600):
+        """
+        Initialize the Redis connection pool.
+        Args:
+            redis_url (str): Redis connection URL.
+            ttl_seconds (int): Idle lifetime of a session.
+        """
+        if aioredis is None:
+            raise ImportError("redis is required for RedisSessionService (pip install redis)")
+        self.redis = aioredis.from_url(redis_url)
+        self.ttl_seconds = ttl_seconds
+        logger.info(f"Using Redis session service at {redis_url}")
+
+    @staticmethod
+    def _key(app_name: str, user_id: str, session_id: str) -> str:
+        return f"adk:sess:{app_name}:{user_id}:{session_id}"
+
+    async def _save(self, session: Session):
+        await self.redis.set(
+            self._key(session.app_name, session.user_id, session.id),
+            session.model_dump_json(),
+            ex=self.ttl_seconds,
+        )
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=state or {},
+            last_update_time=time.time(),
+        )
+        created = await self.redis.set(
+            self._key(app_name, user_id, session_id),
+            session.model_dump_json(),
+            ex=self.ttl_seconds,
+            nx=True,
+        )
+        if not created:
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        raw = await self.redis.get(self._key(app_name, user_id, session_id))
+        if raw is None:
+            return None
+        session = Session.model_validate_json(raw)
+
+        if config:
+            if config.num_recent_events:
+                session.events = session.events[-config.num_recent_events:]
+            if config.after_timestamp:
+                session.events = [
+                    event for event in session.events
+                    if event.timestamp >= config.after_timestamp
+                ]
+        return session
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        pattern = self._key(app_name, user_id or "*", "*")
+        sessions = []
+        async for key in self.redis.scan_iter(match=pattern):
+            raw = await self.redis.get(key)
+            if raw is None:
+                continue
+            session = Session.model_validate_json(raw)
+            # Listings carry ids only, like the other ADK session services
+            session.events = []
+            session.state = {}
+            sessions.append(session)
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        await self.redis.delete(self._key(app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+        session.last_update_time = event.timestamp
+        await self._save(session)
+        return event
+
+    async def close(self):
+        """Close the Redis connection pool."""
+        await self.redis.aclose()
@@ -10,6 +10,10 @@ from src.tools.get_products import get_product_info_async
 from src.tools.create_order import create_order_async
 
 
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+_ORDER_ID_RE = re.compile(r'order_([a-f0-9]+)_')
+
+
 async def _invoke_remote_agent(
     runner,
     session_prefix: str,
@@ -51,6 +55,29 @@ def _json_load(raw: Any) -> Dict[str, Any]:
     return {"raw": raw}
 
 
+def _format_order_confirmation(order_details: Dict[str, Any]) -> str:
+    """Customer-facing Vietnamese confirmation for a created order."""
+    product = " ".join(
+        part for part in (
+            order_details.get("product"),
+            order_details.get("storage"),
+            f"màu {order_details['color']}" if order_details.get("color") else "",
+        ) if part
+    )
+    total_price = order_details.get("total_price", 0)
+    if isinstance(total_price, (int, float)):
+        total_price = f"{total_price:,.0f}".replace(",", ".")
+    return (
+        "Cảm ơn anh/chị! Đơn hàng đã được đặt thành công.\n\n"
+        "Thông tin đơn hàng:\n"
+        f"- Sản phẩm: {product}\n"
+        f"- Số lượng: {order_details.get('quantity', 1)}\n"
+        f"- Tổng giá: {total_price} VNĐ\n"
+        f"- Mã đơn hàng: {order_details.get('order_id')}\n\n"
+        "Chúng tôi sẽ liên hệ với anh/chị trong thời gian sớm nhất. Cảm ơn anh/chị đã tin tưởng!"
+    )
+
+
 async def handle_inventory_agent_call(
     query: str,
     context: str,
@@ -80,13 +107,13 @@ async def handle_inventory_agent_call(
         payload=payload,
         user_id="inventory_agent",
     )
-    logger.debug(f"Inventory Agent response: {agent_response}")
+    logger.opt(lazy=True).debug("Inventory Agent response: {}", lambda: agent_response)
     
     # Step 2: Parse agent response to get params
     try:
         response_data = _json_load(agent_response)
         if not isinstance(response_data, dict):
-            json_match = re.search(r'\{.*\}', agent_response, re.DOTALL)
+            json_match = _JSON_OBJECT_RE.search(agent_response)
             if json_match:
                 response_data = json.loads(json_match.group())
             else:
@@ -112,7 +139,7 @@ async def handle_inventory_agent_call(
             storage=storage,
             color=color
         )
-        logger.debug(f"[A2A] MCP tool result: {mcp_result}")
+        logger.opt(lazy=True).debug("[A2A] MCP tool result: {}", lambda: mcp_result)
         
         mcp_data = _json_load(mcp_result)
         
@@ -157,7 +184,7 @@ async def handle_inventory_agent_call(
             "error": str(e),
         }
     
-    logger.debug(f"Inventory Agent response: {json.dumps(result, ensure_ascii=False)}")
+    logger.opt(lazy=True).debug("Inventory Agent response: {}", lambda: json.dumps(result, ensure_ascii=False))
     return json.dumps(result, ensure_ascii=False)
 
 
@@ -193,13 +220,13 @@ async def handle_order_agent_call(
         payload=payload,
         user_id="order_agent",
     )
-    logger.debug(f"[A2A] Order Agent response: {agent_response}")
+    logger.opt(lazy=True).debug("[A2A] Order Agent response: {}", lambda: agent_response)
     
     # Step 2: Parse agent response to get order params
     try:
         response_data = _json_load(agent_response)
         if not isinstance(response_data, dict):
-            json_match = re.search(r'\{.*\}', agent_response, re.DOTALL)
+            json_match = _JSON_OBJECT_RE.search(agent_response)
             if json_match:
                 response_data = json.loads(json_match.group())
             else:
@@ -237,12 +264,11 @@ async def handle_order_agent_call(
     # Step 3: Call actual MCP tool
     try:
         mcp_result = await create_order_async(order_payload)
-        logger.debug(f"[A2A] MCP tool result: {mcp_result}")
+        logger.opt(lazy=True).debug("[A2A] MCP tool result: {}", lambda: mcp_result)
         
         order_id = "unknown"
         if isinstance(mcp_result, str) and "order_" in mcp_result:
-            import re
-            match = re.search(r'order_([a-f0-9]+)_', mcp_result)
+            match = _ORDER_ID_RE.search(mcp_result)
             if match:
                 order_id = f"order_{match.group(1)}"
         
@@ -270,5 +296,9 @@ async def handle_order_agent_call(
             "message": f"Lỗi khi tạo đơn hàng: {str(e)}",
         }
     
+    # Built outside the MCP try: a formatting problem must not report a created order as failed
+    if result.get("order_created") and result["order_details"]["order_id"] != "unknown":
+        result["customer_response"] = _format_order_confirmation(result["order_details"])
+    
     logger.debug(f"[A2A] Order Agent response: order_created={result.get('order_created')}")
     return json.dumps(result, ensure_ascii=False)
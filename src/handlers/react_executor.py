@@ -1,22 +1,153 @@
 import re
 import json
+import orjson
+import asyncio
+import inspect
+from types import MappingProxyType
 from loguru import logger
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Callable, Tuple, Type, Union, get_origin
+from pydantic import BaseModel, ConfigDict, Json, ValidationError, create_model
+
+_TOOL_CALL_RE = re.compile(r'TOOL_CALL:\s*(\w+)', re.IGNORECASE)
+_ARGS_RE = re.compile(r'ARGS:\s*(\{.+)', re.DOTALL | re.IGNORECASE)
+_DECODER = json.JSONDecoder()
+
+
+# Tool fields of a process_agent_output result when the agent made no tool call
+_NO_TOOL_RESULT = MappingProxyType({
+    "tool_called": False,
+    "tool_name": None,
+    "tool_result": None,
+})
+
+
+def _has_tool_call(agent_output: str) -> bool:
+    """One C-level scan; final answers (no tool call) are the common case."""
+    return 'tool_call' in agent_output.lower()
+
+
+def _loads_args(text: str, attempts: int = 3) -> Any:
+    """
+    Parse the JSON object at the start of `text`.
+    
+    ARGS usually ends the message, so the whole string (or the text up to one
+    of the last few closing braces) parses with orjson; raw_decode covers the rest.
+    
+    Raises:
+        json.JSONDecodeError: If no JSON value starts `text`
+    """
+    end = len(text)
+    for _ in range(attempts):
+        try:
+            return orjson.loads(text[:end])
+        except orjson.JSONDecodeError:
+            end = text.rfind('}', 0, end - 1) + 1
+            if end <= 0:
+                break
+    return _DECODER.raw_decode(text)[0]
 
 
 class ReActToolExecutor:
     """Parse ReAct agent output and execute tools."""
     
-    def __init__(self, tools: Dict[str, Callable]):
+    __slots__ = ("tools", "_tools_get", "_available_tools_str", "_validators", "_side_effect_tools", "_async_tools_get")
+    
+    def __init__(
+        self,
+        tools: Mapping[str, Callable],
+        side_effect_tools: Iterable[str] = (),
+        async_tools: Optional[Mapping[str, Callable]] = None
+    ):
         """
         Initialize with a mapping of tool names to callables.
         
         Args:
-            tools: Dict mapping tool name (str) to tool function (Callable)
+            tools: Mapping of tool name (str) to tool function (Callable) used by the
+                sync API; a MappingProxyType is used as-is
+            side_effect_tools: Names of tools that change state (e.g. create an order);
+                at most one such call runs per agent turn and never concurrently
+            async_tools: Coroutine variants preferred by the async API, keyed like `tools`
         """
-        self.tools = tools
+        self._side_effect_tools = frozenset(side_effect_tools)
+        self.tools = tools if isinstance(tools, MappingProxyType) else MappingProxyType(tools)
+        self._tools_get = self.tools.get
+        self._async_tools_get = MappingProxyType({**tools, **(async_tools or {})}).get
+        self._available_tools_str = repr(list(tools))
+        # Argument models built once from each tool's signature (None: call unchecked)
+        self._validators = {name: self._build_validator(name, func) for name, func in tools.items()}
+    
+    @classmethod
+    def from_pipeline(
+        cls,
+        check_inventory_func: Callable,
+        create_order_func: Callable,
+        check_inventory_async: Optional[Callable] = None,
+        create_order_async_func: Optional[Callable] = None
+    ) -> "ReActToolExecutor":
+        """Build the executor for the sales pipeline tools (async variants serve the async API)."""
+        async_tools = {
+            name: func for name, func in (
+                ("check_inventory_detail", check_inventory_async),
+                ("create_customer_order", create_order_async_func),
+            ) if func is not None
+        }
+        return cls(
+            MappingProxyType({
+                "check_inventory_detail": check_inventory_func,
+                "create_customer_order": create_order_func
+            }),
+            side_effect_tools=("create_customer_order",),
+            async_tools=async_tools
+        )
+    
+    @staticmethod
+    def _build_validator(tool_name: str, func: Callable) -> Optional[Type[BaseModel]]:
+        try:
+            params = inspect.signature(func).parameters.values()
+        except (TypeError, ValueError):
+            # Some builtins expose no signature; let the call itself validate
+            return None
+        
+        fields = {}
+        for param in params:
+            if param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+                return None
+            annotation = Any if param.annotation is inspect.Parameter.empty else param.annotation
+            if annotation is dict or get_origin(annotation) is dict:
+                # Agents often send nested objects as JSON text; the tools accept both
+                annotation = Union[annotation, Json[annotation]]
+            default = ... if param.default is inspect.Parameter.empty else param.default
+            fields[param.name] = (annotation, default)
         
-    def parse_tool_call(self, agent_output: str) -> Optional[Dict[str, Any]]:
+        return create_model(
+            f"{tool_name}_args",
+            __config__=ConfigDict(extra="forbid", coerce_numbers_to_str=True, arbitrary_types_allowed=True),
+            **fields
+        )
+    
+    def _validate_tool_call(
+        self, tool_name: str, args: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Check `tool_name` exists and validate `args` against its signature.
+        
+        Returns:
+            (validated args, None) on success, (args, error message) otherwise
+        """
+        if self._tools_get(tool_name) is None:
+            return args, f"Tool '{tool_name}' not found. Available tools: {self._available_tools_str}"
+        validator = self._validators[tool_name]
+        if validator is None:
+            return args, None
+        try:
+            return dict(validator.model_validate(args)), None
+        except ValidationError as e:
+            details = "; ".join(
+                f"{'.'.join(map(str, err['loc'])) or 'args'}: {err['msg']}" for err in e.errors()
+            )
+            return args, f"Tool '{tool_name}' argument error: {details}"
+        
+    def parse_tool_call(self, agent_output: str) -> Optional[Tuple[str, Dict[str, Any]]]:
         """
         Parse agent output for tool call pattern.
         
@@ -25,102 +156,137 @@ class ReActToolExecutor:
             ARGS: {"arg1": "value1", "arg2": "value2"}
         
         Returns:
-            Dict with 'tool_name' and 'args' if found, None otherwise
+            (tool_name, args) if found, None otherwise
         """
-        tool_match = re.search(r'TOOL_CALL:\s*(\w+)', agent_output, re.IGNORECASE)
-        if not tool_match:
-            logger.debug("No TOOL_CALL found in agent output")
-            return None
-        
-        tool_name = tool_match.group(1).strip()
+        tool_calls = self.parse_tool_calls(agent_output)
+        return tool_calls[0] if tool_calls else None
+    
+    def parse_tool_calls(self, agent_output: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Parse every TOOL_CALL/ARGS block in agent output, in order.
         
-        args_match = re.search(r'ARGS:\s*(\{.+)', agent_output, re.DOTALL | re.IGNORECASE)
-        if not args_match:
-            logger.error(f"Found TOOL_CALL but no ARGS for {tool_name}")
-            return None
+        Returns:
+            List of (tool_name, args) tuples (empty if none found)
+        """
+        if not _has_tool_call(agent_output):
+            logger.debug("No TOOL_CALL found in agent output")
+            return []
         
-        args_section = args_match.group(1).strip()
+        tool_matches = list(_TOOL_CALL_RE.finditer(agent_output))
+        if not tool_matches:
+            logger.debug("No TOOL_CALL found in agent output")
+            return []
         
-        json_str = self._extract_json_from_text(args_section)
+        tool_calls = []
+        for i, tool_match in enumerate(tool_matches):
+            # ARGS for this call must appear before the next TOOL_CALL
+            end = tool_matches[i + 1].start() if i + 1 < len(tool_matches) else len(agent_output)
+            tool_call = self._parse_tool_block(tool_match.group(1).strip(), agent_output, tool_match.end(), end)
+            if tool_call:
+                tool_calls.append(tool_call)
         
-        if json_str:
-            try:
-                args = json.loads(json_str)
-                logger.info(f"Parsed tool call: {tool_name} with args keys: {list(args.keys())}")
-                return {"tool_name": tool_name, "args": args}
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse args JSON: {e}")
-                logger.debug(f"Args string was: {json_str[:300]}")
+        return tool_calls
+    
+    def _parse_tool_block(
+        self, tool_name: str, text: str, start: int, end: int
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Parse the ARGS JSON in text[start:end], which follows a single TOOL_CALL line."""
+        # Agents almost always write "ARGS: {" verbatim; the regex only handles other spellings
+        idx = text.find("ARGS:", start, end)
+        args_section = text[idx + 5:end].strip() if idx != -1 else ""
+        if not args_section.startswith("{"):
+            # Search in place rather than slicing a copy of the block
+            args_match = _ARGS_RE.search(text, start, end)
+            if not args_match:
+                logger.error(f"Found TOOL_CALL but no ARGS for {tool_name}")
                 return None
+            args_section = args_match.group(1).strip()
         
-        logger.error(f"Could not extract valid JSON from ARGS section")
-        return None
-    
-    def _extract_json_from_text(self, text: str) -> Optional[str]:
-        """Extract first complete JSON object from text using brace counting."""
-        if not text.startswith('{'):
+        try:
+            args = _loads_args(args_section)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse args JSON: {e}")
+            logger.opt(lazy=True).debug("Args string was: {}", lambda: args_section[:300])
             return None
         
-        brace_count = 0
-        in_string = False
-        escape_next = False
+        logger.opt(lazy=True).info("Parsed tool call: {} with args keys: {}", lambda: tool_name, lambda: list(args))
+        return tool_name, args
+    
+    def execute_tool(self, tool_name: str, args: Dict[str, Any]) -> Any:
+        """
+        Execute the parsed tool call.
         
-        for i, char in enumerate(text):
-            if escape_next:
-                escape_next = False
-                continue
-            
-            if char == '\\':
-                escape_next = True
-                continue
+        Args:
+            tool_name: Name of the tool to run
+            args: Keyword arguments for the tool
             
-            if char == '"' and not escape_next:
-                in_string = not in_string
-                continue
+        Returns:
+            The tool's return value unchanged, or {"error": message} if the call failed;
+            serializing it is left to the caller
             
-            if not in_string:
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        return text[:i+1]
+        Raises:
+            TypeError: If the tool is a coroutine function (use execute_tool_async)
+        """
+        args, error_msg = self._validate_tool_call(tool_name, args)
+        if error_msg:
+            logger.error(error_msg)
+            return {"error": error_msg}
+        
+        tool_func = self._tools_get(tool_name)
+        if inspect.iscoroutinefunction(tool_func):
+            raise TypeError(f"Tool '{tool_name}' is a coroutine function; call execute_tool_async")
         
-        return None
+        try:
+            logger.opt(lazy=True).info("Executing tool: {} with args: {}", lambda: tool_name, lambda: args)
+            result = tool_func(**args)
+            logger.opt(lazy=True).info("Tool execution successful: {}", lambda: result)
+            return result
+        except TypeError as e:
+            error_msg = f"Tool '{tool_name}' argument error: {e}"
+            logger.error(error_msg)
+            return {"error": error_msg}
+        except Exception as e:
+            error_msg = f"Tool '{tool_name}' execution error: {e}"
+            logger.error(error_msg, exc_info=True)
+            return {"error": error_msg}
     
-    def execute_tool(self, tool_call_info: Dict[str, Any]) -> str:
+    async def execute_tool_async(self, tool_name: str, args: Dict[str, Any]) -> Any:
         """
-        Execute the parsed tool call.
+        Execute the parsed tool call without blocking the event loop.
+        
+        Coroutine tools are awaited directly; plain functions run in a worker thread.
         
         Args:
-            tool_call_info: Dict with 'tool_name' and 'args'
+            tool_name: Name of the tool to run
+            args: Keyword arguments for the tool
             
         Returns:
-            Tool execution result as string
+            The tool's return value unchanged, or {"error": message} if the call failed;
+            serializing it is left to the caller
         """
-        tool_name = tool_call_info.get("tool_name")
-        args = tool_call_info.get("args", {})
-        
-        if tool_name not in self.tools:
-            error_msg = f"Tool '{tool_name}' not found. Available tools: {list(self.tools.keys())}"
+        args, error_msg = self._validate_tool_call(tool_name, args)
+        if error_msg:
             logger.error(error_msg)
-            return json.dumps({"error": error_msg})
+            return {"error": error_msg}
         
-        tool_func = self.tools[tool_name]
+        tool_func = self._async_tools_get(tool_name)
         
         try:
-            logger.info(f"Executing tool: {tool_name} with args: {args}")
-            result = tool_func(**args)
-            logger.info(f"Tool execution successful: {result if isinstance(result, str) else result}")
+            logger.opt(lazy=True).info("Executing tool: {} with args: {}", lambda: tool_name, lambda: args)
+            if inspect.iscoroutinefunction(tool_func):
+                result = await tool_func(**args)
+            else:
+                result = await asyncio.to_thread(tool_func, **args)
+            logger.opt(lazy=True).info("Tool execution successful: {}", lambda: result)
             return result
         except TypeError as e:
             error_msg = f"Tool '{tool_name}' argument error: {e}"
             logger.error(error_msg)
-            return json.dumps({"error": error_msg})
+            return {"error": error_msg}
         except Exception as e:
             error_msg = f"Tool '{tool_name}' execution error: {e}"
             logger.error(error_msg, exc_info=True)
-            return json.dumps({"error": error_msg})
+            return {"error": error_msg}
     
     def process_agent_output(self, agent_output: str) -> Dict[str, Any]:
         """
@@ -130,43 +296,114 @@ class ReActToolExecutor:
             Dict with:
                 - tool_called: bool
                 - tool_name: str (if called)
-                - tool_result: str (if called)
+                - tool_result: raw tool result or error dict (if called)
                 - original_output: str (agent output)
         """
-        result = {
-            "tool_called": False,
-            "tool_name": None,
-            "tool_result": None,
-            "original_output": agent_output
-        }
+        result = {**_NO_TOOL_RESULT, "original_output": agent_output}
+        if not _has_tool_call(agent_output):
+            return result
         
-        tool_call_info = self.parse_tool_call(agent_output)
+        parsed = self.parse_tool_call(agent_output)
         
-        if tool_call_info:
+        if parsed is not None:
+            tool_name, args = parsed
             result["tool_called"] = True
-            result["tool_name"] = tool_call_info["tool_name"]
-            result["tool_result"] = self.execute_tool(tool_call_info)
+            result["tool_name"] = tool_name
+            result["tool_result"] = self.execute_tool(tool_name, args)
         
         return result
+    
+    def _plan_tool_calls(
+        self, tool_calls: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Drop repeated calls and every side-effecting call after the first."""
+        if len(tool_calls) < 2:
+            return tool_calls
+        planned = []
+        seen = set()
+        side_effect_planned = False
+        for tool_name, args in tool_calls:
+            key = _call_key(tool_name, args)
+            if key in seen:
+                logger.warning(f"Skipping repeated tool call: {tool_name}")
+                continue
+            seen.add(key)
+            if tool_name in self._side_effect_tools:
+                if side_effect_planned:
+                    logger.warning(f"Skipping extra side-effecting tool call in one turn: {tool_name}")
+                    continue
+                side_effect_planned = True
+            planned.append((tool_name, args))
+        return planned
+    
+    async def process_agent_output_async(self, agent_output: str) -> Dict[str, Any]:
+        """
+        Async counterpart of process_agent_output that runs the tool calls found.
+        
+        Repeated identical calls run once. Read-only tools run concurrently; only the
+        first call to a side-effecting tool runs, after them, so a model that echoes
+        an order block cannot create two orders.
+        
+        Returns:
+            Same keys as process_agent_output (describing the first call), plus
+                - tool_calls: list of dicts with 'tool_name', 'args' and 'tool_result'
+        """
+        result = {**_NO_TOOL_RESULT, "tool_calls": [], "original_output": agent_output}
+        if not _has_tool_call(agent_output):
+            return result
+        
+        tool_calls = self._plan_tool_calls(self.parse_tool_calls(agent_output))
+        
+        if tool_calls:
+            if len(tool_calls) == 1:
+                tool_outputs = [await self.execute_tool_async(*tool_calls[0])]
+            else:
+                side_effect = [i for i, (name, _) in enumerate(tool_calls) if name in self._side_effect_tools]
+                tool_outputs = await asyncio.gather(*(
+                    self.execute_tool_async(tool_name, args)
+                    for i, (tool_name, args) in enumerate(tool_calls) if i not in side_effect
+                ))
+                for i in side_effect:
+                    tool_outputs.insert(i, await self.execute_tool_async(*tool_calls[i]))
+            result["tool_calls"] = [
+                {"tool_name": tool_name, "args": args, "tool_result": tool_output}
+                for (tool_name, args), tool_output in zip(tool_calls, tool_outputs)
+            ]
+            result["tool_called"] = True
+            result["tool_name"] = tool_calls[0][0]
+            result["tool_result"] = tool_outputs[0]
+        
+        return result
+
+
+def _call_key(tool_name: str, args: Dict[str, Any]) -> Tuple[str, bytes]:
+    return tool_name, orjson.dumps(args, option=orjson.OPT_SORT_KEYS, default=str)
 
 
 def create_tool_executor_for_pipeline(
     check_inventory_func: Callable,
-    create_order_func: Callable
+    create_order_func: Callable,
+    check_inventory_async: Optional[Callable] = None,
+    create_order_async_func: Optional[Callable] = None
 ) -> ReActToolExecutor:
     """
     Create a ReActToolExecutor with pipeline tools.
     
+    The async variants, when given, are used by the async methods; the sync
+    methods always run the sync functions.
+    
     Args:
         check_inventory_func: Function to check inventory
         create_order_func: Function to create order
+        check_inventory_async: Coroutine function to check inventory
+        create_order_async_func: Coroutine function to create order
         
     Returns:
         ReActToolExecutor instance
     """
-    tools = {
-        "check_inventory_detail": check_inventory_func,
-        "create_customer_order": create_order_func
-    }
-    
-    return ReActToolExecutor(tools)
+    return ReActToolExecutor.from_pipeline(
+        check_inventory_func,
+        create_order_func,
+        check_inventory_async,
+        create_order_async_func
+    )
@@ -1,9 +1,16 @@
+import re
 import json
-from typing import Dict, Any, Optional
+import uuid
+import hashlib
+import asyncio
+import orjson
+from types import MappingProxyType
+from typing import Dict, Any, Optional, AsyncIterator, Union
 from loguru import logger
 
 from google.genai import types
 from google.adk.runners import Runner
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.sessions import InMemorySessionService
 
 from src.agents.routes import (
@@ -17,6 +24,58 @@ from src.handlers.invoke_agents import (
     handle_inventory_agent_call,
     handle_order_agent_call
 )
+from src.config.settings import cache_config
+from src.config.schemas import AgentOutput
+from src.utils.semantic_cache import SemanticCache
+from src.utils.llm_cache import TTLCache
+from src.utils.intent_classifier import classify_intent
+
+
+DEFAULT_ANALYSIS = MappingProxyType({
+    "requires_inventory_check": False,
+    "requires_order_placement": False,
+})
+
+# Fixed trace slots, one per pipeline step
+_ANALYSIS_SLOT, _INVENTORY_SLOT, _ORDER_SLOT, _CONSULTANT_SLOT = range(4)
+
+# Consultant runs in SSE mode so partial text events can be forwarded
+_STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+_ANALYSIS_CACHE_MAXSIZE = 4096
+_WHITESPACE_RE = re.compile(r"\s+")
+_JSON_OPEN = ("{", "[")
+
+
+def _normalize_query(query: str) -> str:
+    """Cache key for a query: casefolded, whitespace collapsed."""
+    return _WHITESPACE_RE.sub(" ", query.strip().casefold())
+
+
+def _quick_analyze(query: str) -> Optional[Dict[str, Any]]:
+    """Analysis for small-talk queries without calling the Analysis Agent, else None."""
+    # Only the classifier's greeting path: it applies when no product, stock or order pattern matches
+    classified, confidence = classify_intent(query)
+    if confidence <= 0.0 or classified["customer_intent"] != "general_query":
+        return None
+    return {
+        "product_details": "",
+        "customer_intent": "general_query",
+        "original_query": query,
+        **DEFAULT_ANALYSIS,
+    }
+
+
+def _prebuilt_response(*payloads: Dict[str, Any]) -> Optional[str]:
+    """Return a complete customer message already produced by a handler, if any."""
+    for data in payloads:
+        if not isinstance(data, dict):
+            continue
+        if data.get("customer_response"):
+            return data["customer_response"]
+        if data.get("status") == "confirmed" and data.get("message"):
+            return data["message"]
+    return None
 
 
 class A2APipeline:
@@ -29,6 +88,18 @@ class A2APipeline:
         
         self.session_service = InMemorySessionService()
         
+        # Analysis depends only on the query text: normalized query → result
+        self._analysis_cache = TTLCache(_ANALYSIS_CACHE_MAXSIZE)
+        
+        self._consultant_cache = (
+            SemanticCache(
+                model_name=cache_config.semantic_cache_model,
+                threshold=cache_config.semantic_cache_threshold,
+            )
+            if cache_config.semantic_cache_enabled
+            else None
+        )
+        
         self.registry = AgentRegistry()
         
         self.analysis_agent = AnalysisAgent()
@@ -65,17 +136,25 @@ class A2APipeline:
         self.registry.register(
             name="inventory_agent",
             agent=self.inventory_agent.agent,
-            handler=lambda query, context: handle_inventory_agent_call(
-                query, context, self.inventory_runner, self.inventory_agent
-            )
+            handler=self._inventory_handler
         )
         
         self.registry.register(
             name="order_agent",
             agent=self.order_agent.agent,
-            handler=lambda query, inventory_info, customer_info: handle_order_agent_call(
-                query, inventory_info, customer_info, self.order_runner, self.order_agent
-            )
+            handler=self._order_handler
+        )
+    
+    async def _inventory_handler(self, query: str, context: str) -> str:
+        """Registry handler for the inventory agent."""
+        return await handle_inventory_agent_call(
+            query, context, self.inventory_runner, self.inventory_agent
+        )
+    
+    async def _order_handler(self, query: str, inventory_info: str, customer_info: str) -> str:
+        """Registry handler for the order agent."""
+        return await handle_order_agent_call(
+            query, inventory_info, customer_info, self.order_runner, self.order_agent
         )
     
     async def _create_agent_session(self, runner: Runner, base_session):
@@ -98,10 +177,55 @@ class A2APipeline:
         self,
         query: str,
         session_id: Optional[str] = None,
-        customer_context: Optional[Dict[str, Any]] = None
+        customer_context: Optional[Dict[str, Any]] = None,
+        include_trace: bool = True,
+        force_consultant: bool = False,
     ) -> Dict[str, Any]:
         """
-        Run A2A pipeline with Agent Card pattern
+        Run A2A pipeline and return only the final result.
+        Drains `run_stream` and drops the consultant deltas.
+        """
+        result: Dict[str, Any] = {}
+        async for chunk in self.run_stream(
+            query=query,
+            session_id=session_id,
+            customer_context=customer_context,
+            include_trace=include_trace,
+            force_consultant=force_consultant,
+        ):
+            if chunk["type"] == "final":
+                result = chunk
+        result.pop("type", None)
+        return result
+    
+    async def run_batch(
+        self,
+        queries: list[str],
+        max_concurrency: int = 8,
+        customer_context: Optional[Dict[str, Any]] = None,
+    ) -> list[Union[Dict[str, Any], BaseException]]:
+        """
+        Run independent queries concurrently, at most `max_concurrency` at a time.
+        Results keep the order of `queries`; a failed query yields its exception.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _one(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.run(query=query, customer_context=customer_context)
+
+        return await asyncio.gather(*map(_one, queries), return_exceptions=True)
+    
+    async def run_stream(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        customer_context: Optional[Dict[str, Any]] = None,
+        include_trace: bool = True,
+        force_consultant: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run A2A pipeline with Agent Card pattern, streaming the consultant reply
         
         Flow:
         1. Analysis Agent → analyzes query
@@ -110,17 +234,23 @@ class A2APipeline:
            - Calls agents through their handlers
         3. Consultant Agent → generates final response
         
+        Yields `{"type": "delta", "agent": "consultant", "text": ...}` for each
+        partial consultant chunk, then one `{"type": "final", ...result}`.
+        Callers such as a FastAPI `StreamingResponse` serialize each chunk as it arrives.
+        
         Args:
             query: User query
             session_id: Optional session ID
             customer_context: Optional customer info
+            include_trace: Collect per-agent outputs; when False,
+                `agent_outputs` is returned empty
+            force_consultant: Always call the Consultant Agent, even when the
+                order/inventory handler already returned a customer message
         
-        Returns:
-            Dict with response and metadata
+        Yields:
+            Delta dicts followed by the final dict with response and metadata
         """
         logger.info(f"\n\n[A2A Pipeline] Query: {query}")
-        
-        import uuid
 
         # Create or fetch root session
         if session_id is None:
@@ -133,33 +263,52 @@ class A2APipeline:
         
         logger.info(f"Session: {session_id}")
         
-        agent_outputs = []
+        agent_outputs: list[Optional[AgentOutput]] = [None] * 4
         
-        # Analysis Agent
-        analysis_session = await self._create_agent_session(self.analysis_runner, session)
-        message = types.Content(role="user", parts=[types.Part(text=query)])
-        analysis_result = ""
-        async for event in self.analysis_runner.run_async(
-            user_id=analysis_session.user_id,
-            session_id=analysis_session.id,
-            new_message=message
-        ):
-            if getattr(event, "is_final_response", False):
-                if event.content and event.content.parts:
-                    analysis_result = event.content.parts[0].text
-                break
+        # Analysis Agent (skipped for small talk or when the same query was analysed recently)
+        quick_analysis = _quick_analyze(query)
+        analysis_key = _normalize_query(query)
+        if quick_analysis is not None:
+            logger.debug("Small-talk query, skipping Analysis Agent")
+            analysis_result = json.dumps(quick_analysis, ensure_ascii=False)
+        else:
+            analysis_result = self._analysis_cache.get(analysis_key)
+        analysis_fresh = analysis_result is None
+        if analysis_fresh:
+            analysis_session = await self._create_agent_session(self.analysis_runner, session)
+            message = types.Content(role="user", parts=[types.Part(text=query)])
+            analysis_result = ""
+            async for event in self.analysis_runner.run_async(
+                user_id=analysis_session.user_id,
+                session_id=analysis_session.id,
+                new_message=message
+            ):
+                if getattr(event, "is_final_response", False):
+                    if event.content and event.content.parts:
+                        analysis_result = event.content.parts[0].text
+                    break
+        else:
+            logger.debug("Analysis cache hit")
         
-        agent_outputs.append({"agent": "analysis", "output": analysis_result})
-        logger.debug(f"Analysis Agent response: {analysis_result}")
+        if include_trace:
+            agent_outputs[_ANALYSIS_SLOT] = AgentOutput("analysis", analysis_result)
+        logger.opt(lazy=True).debug("Analysis Agent response: {}", lambda: analysis_result)
         
-        try:
-            analysis_data = json.loads(analysis_result)
-        except:
+        # Only pay for a parse when the output looks like JSON
+        analysis_data = DEFAULT_ANALYSIS
+        stripped = (analysis_result or "").lstrip()
+        if stripped.startswith(_JSON_OPEN):
+            try:
+                parsed = orjson.loads(stripped)
+                if isinstance(parsed, dict):
+                    analysis_data = parsed
+                    # Only a usable analysis is replayed; prose or broken JSON is retried next time
+                    if analysis_fresh:
+                        self._analysis_cache.set(analysis_key, analysis_result, cache_config.analysis_cache_ttl)
+            except orjson.JSONDecodeError:
+                logger.warning("Analysis output not JSON, using defaults")
+        else:
             logger.warning("Analysis output not JSON, using defaults")
-            analysis_data = {
-                "requires_inventory_check": False,
-                "requires_order_placement": False
-            }
         
         # Call Inventory Agent via Registry (if required)
         inventory_result = ""
@@ -172,13 +321,11 @@ class A2APipeline:
                         query=analysis_data.get("product_details") or query,
                         context=json.dumps(analysis_data, ensure_ascii=False)
                     )
-                    agent_outputs.append({
-                        "agent": "inventory",
-                        "output": inventory_result
-                    })
+                    if include_trace:
+                        agent_outputs[_INVENTORY_SLOT] = AgentOutput("inventory", inventory_result)
                     try:
-                        inventory_data = json.loads(inventory_result) if inventory_result else {}
-                    except json.JSONDecodeError:
+                        inventory_data = orjson.loads(inventory_result) if inventory_result else {}
+                    except orjson.JSONDecodeError:
                         logger.warning("Inventory agent output not JSON parseable")
                 except Exception as inv_err:
                     logger.error(f"[A2A Pipeline] Inventory agent failed: {inv_err}", exc_info=True)
@@ -201,13 +348,11 @@ class A2APipeline:
                             "conversation_id": session_id
                         }, ensure_ascii=False)
                     )
-                    agent_outputs.append({
-                        "agent": "order",
-                        "output": order_result
-                    })
+                    if include_trace:
+                        agent_outputs[_ORDER_SLOT] = AgentOutput("order", order_result)
                     try:
-                        order_data = json.loads(order_result) if order_result else {}
-                    except json.JSONDecodeError:
+                        order_data = orjson.loads(order_result) if order_result else {}
+                    except orjson.JSONDecodeError:
                         logger.warning("Order agent output not JSON parseable")
                 except Exception as order_err:
                     logger.error(f"[A2A Pipeline] Order agent failed: {order_err}", exc_info=True)
@@ -219,8 +364,32 @@ class A2APipeline:
             "customer_name": "Khách hàng",
             "conversation_id": session_id
         }
+        customer_json = json.dumps(customer_info, ensure_ascii=False, indent=2)
+        
+        # Handlers may already have written the customer message (e.g. order confirmation)
+        prebuilt_response = None if force_consultant else _prebuilt_response(order_data, inventory_data)
         
-        consultant_prompt = f"""
+        # Paraphrased queries over identical inventory/customer data share an answer;
+        # order confirmations are never replayed from cache
+        cache_text = cache_scope = cached_response = None
+        if prebuilt_response is None and self._consultant_cache is not None and not order_result:
+            cache_text = (
+                f"{query}\n{analysis_data.get('product_details', '')}\n"
+                f"{analysis_data.get('customer_intent', '')}"
+            )
+            cache_scope = hashlib.sha256(f"{inventory_result}\x00{customer_json}".encode()).hexdigest()
+            cached_response = await asyncio.to_thread(self._consultant_cache.get, cache_text, cache_scope)
+        
+        if prebuilt_response is not None:
+            logger.debug("Using handler-provided customer response, skipping Consultant Agent")
+            final_response = prebuilt_response
+            yield {"type": "delta", "agent": "consultant", "text": final_response}
+        elif cached_response is not None:
+            logger.debug("Consultant cache hit")
+            final_response = cached_response
+            yield {"type": "delta", "agent": "consultant", "text": final_response}
+        else:
+            consultant_prompt = f"""
 Bạn là Agentias, một Consultant Agent chuyên phản hồi khách hàng dựa trên thông tin từ các agent khác.
 Đây là thông tin cá nhân của bạn:
 Bạn tên là Agentias, làm việc tại cửa hàng điện thoại di động ABC.
@@ -240,46 +409,65 @@ Order Result:
 {order_result if order_result else "Không tạo đơn"}
 
 Thông tin cá nhân của khách hàng:
-{json.dumps(customer_info, ensure_ascii=False, indent=2)}
+{customer_json}
 
 YÊU CẦU:
 - Trả lời thân thiện bằng tiếng Việt
 - KHÔNG đưa số điện thoại của khách hàng trong câu trả lời (đây là thông tin cá nhân của họ)
 - Không sử dụng /*PLANNING*/, không đưa mã nguồn hoặc pseudo-code
 - Chỉ trả lời bằng đoạn văn hoàn chỉnh
+- Chỉ trả về văn bản thuần, không JSON
 """
+            
+            consultant_session = await self._create_agent_session(self.consultant_runner, session)
+            message = types.Content(role="user", parts=[types.Part(text=consultant_prompt)])
+            final_response = ""
+            streamed = False
+            async for event in self.consultant_runner.run_async(
+                user_id=consultant_session.user_id,
+                session_id=consultant_session.id,
+                new_message=message,
+                run_config=_STREAMING_RUN_CONFIG
+            ):
+                text = event.content.parts[0].text if event.content and event.content.parts else None
+                if event.partial:
+                    if text:
+                        streamed = True
+                        yield {"type": "delta", "agent": "consultant", "text": text}
+                    continue
+                if event.is_final_response():
+                    final_response = text or ""
+                    break
+            
+            # Remote agents may answer in one piece; still surface it as a delta
+            if not streamed and final_response:
+                yield {"type": "delta", "agent": "consultant", "text": final_response}
+            
+            # The prompt asks for plain text; unwrap {"response": ...} only as a fallback
+            if isinstance(final_response, str):
+                if final_response[:1].isspace() or final_response[-1:].isspace():
+                    final_response = final_response.strip()
+                if len(final_response) > 2 and final_response[0] == "{" and final_response[-1] == "}":
+                    try:
+                        parsed = orjson.loads(final_response)
+                        if isinstance(parsed, dict):
+                            final_response = parsed.get("response", final_response)
+                    except orjson.JSONDecodeError:
+                        pass
+            
+            if cache_text is not None and final_response:
+                await asyncio.to_thread(self._consultant_cache.set, cache_text, final_response, cache_scope)
         
-        consultant_session = await self._create_agent_session(self.consultant_runner, session)
-        message = types.Content(role="user", parts=[types.Part(text=consultant_prompt)])
-        final_response = ""
-        async for event in self.consultant_runner.run_async(
-            user_id=consultant_session.user_id,
-            session_id=consultant_session.id,
-            new_message=message
-        ):
-            if getattr(event, "is_final_response", False):
-                if event.content and event.content.parts:
-                    final_response = event.content.parts[0].text
-                break
-        
-        agent_outputs.append({"agent": "consultant", "output": final_response})
-        
-        if isinstance(final_response, str):
-            final_response = final_response.strip()
-            if final_response.startswith("{") and final_response.endswith("}"):
-                try:
-                    parsed = json.loads(final_response)
-                    final_response = parsed.get("response", final_response)
-                except json.JSONDecodeError:
-                    pass
+        if include_trace:
+            agent_outputs[_CONSULTANT_SLOT] = AgentOutput("consultant", final_response)
         
         result = {
             "customer_response": final_response or "Xin lỗi, tôi không thể xử lý yêu cầu lúc này.",
-            "agent_outputs": agent_outputs,
+            "agent_outputs": tuple(o for o in agent_outputs if o is not None) if include_trace else (),
             "session_id": session_id,
             "status": "success"
         }
         
         logger.info(f"[A2A Pipeline] Consultant Agent response: {final_response}")
         logger.info(f"[A2A Pipeline] Completed for session: {session_id}")
-        return result
+        yield {"type": "final", **result}
@@ -1,10 +1,18 @@
-import json
+import uuid
+import hashlib
+import asyncio
+import orjson
+from contextlib import aclosing
 from loguru import logger
 from google.genai import types
 from google.adk.runners import Runner
-from typing import Dict, Any, Optional
+from google.adk.events import Event
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 from google.adk.models.lite_llm import LiteLlm
-from google.adk.sessions import InMemorySessionService
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.errors.already_exists_error import AlreadyExistsError
 
 from src.agents.agents_react import (
     AnalysisAgent, 
@@ -12,10 +20,96 @@ from src.agents.agents_react import (
     OrderAgentReAct, 
     ConsultantAgent
 )
-from src.tools.create_order import create_customer_order
-from src.tools.get_products import check_inventory_detail
+from src.tools.create_order import create_customer_order, create_customer_order_async
+from src.tools.get_products import check_inventory_detail, check_inventory_detail_async
 from src.handlers.react_executor import create_tool_executor_for_pipeline
-from src.config.settings import api_config
+from src.config.settings import api_config, cache_config
+from src.db.redis_session import RedisSessionService
+from src.config.schemas import AgentOutput, AnalysisSchema
+from src.utils.json_extract import extract_json_object
+from src.utils.intent_classifier import classify_intent
+from src.utils.metrics import get_metrics_collector
+from src.utils.llm_cache import TTLCache
+from src.utils.http_client import install_litellm_client
+
+_AGENT_SESSION_CACHE_MAXSIZE = 4096
+_AGENT_CACHE_MAXSIZE = 2048
+
+# Classifier confidence needed to skip the Analysis Agent
+_CLASSIFIER_MIN_CONFIDENCE = 0.9
+
+# Structured agents stream in SSE mode so a finished JSON answer can stop the run early
+_STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+# Static instructions first and request data last, so repeated calls share a
+# byte-identical prefix the LLM server can cache
+_ANALYSIS_TMPL = (
+    "Context: %(context)s\n"
+    "Câu hỏi khách hàng: %(query)s"
+)
+_ANALYSIS_RETRY_TMPL = (
+    "Phản hồi trước không phải JSON hợp lệ. Chỉ trả về DUY NHẤT một đối tượng JSON, "
+    "không markdown, không giải thích, có đủ các trường requires_inventory_check "
+    "và requires_order_placement (boolean).\n"
+    "%(prompt)s"
+)
+_INVENTORY_TMPL = (
+    "Dựa trên kết quả phân tích bên dưới, hãy kiểm tra tồn kho.\n"
+    "Hãy gọi tool check_inventory_detail với format:\n"
+    "TOOL_CALL: check_inventory_detail\n"
+    'ARGS: {"product": "...", "storage": "...", "color": "..."}\n'
+    "---\n"
+    "DỮ LIỆU:\n"
+    "Analysis: %(analysis)s"
+)
+_ORDER_TMPL = (
+    "Khởi tạo đơn hàng dựa trên thông tin bên dưới.\n"
+    "Hãy gọi tool create_customer_order với format:\n"
+    "TOOL_CALL: create_customer_order\n"
+    'ARGS: {"order_details": {...}}\n'
+    "---\n"
+    "DỮ LIỆU:\n"
+    "%(customer_context)s"
+    "Analysis: %(analysis)s\n"
+    "Inventory: %(inventory)s"
+)
+_CONSULTANT_TMPL = (
+    "Sinh câu trả lời cuối cùng cho khách hàng dựa trên thông tin bên dưới.\n"
+    "Trả lời thân thiện bằng tiếng Việt.\n"
+    "---\n"
+    "DỮ LIỆU:\n"
+    "%(customer_context)s"
+    "Analysis: %(analysis)s\n"
+    "Inventory: %(inventory)s\n"
+    "Order: %(order)s\n"
+    "Customer query: %(query)s"
+)
+
+
+def _is_complete_json(text: str) -> bool:
+    """Cheap bracket check first; only parse when the buffer looks closed."""
+    text = text.strip()
+    if not (text.startswith("{") and text.endswith("}")):
+        return False
+    try:
+        orjson.loads(text)
+        return True
+    except orjson.JSONDecodeError:
+        return False
+
+
+def _tool_result_text(result: Any) -> str:
+    """Serialize a raw tool result for the next prompt (tools mostly return JSON text already)."""
+    if isinstance(result, str):
+        return result
+    return orjson.dumps(result, default=str).decode()
+
+
+def _is_tool_error(result: Any) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    text = str(result)
+    return '"error"' in text or text.startswith("Error")
 
 
 class MultiAgentsReAct:
@@ -24,6 +118,8 @@ class MultiAgentsReAct:
         self.app_name = app_name
         
         try:
+            # All agents share one pooled connection set to the LLM server
+            install_litellm_client()
             self.client = LiteLlm(
                 model="openai/Qwen/Qwen3-8B",
                 api_base=api_config.base_url_llm,
@@ -33,7 +129,11 @@ class MultiAgentsReAct:
             logger.error(f"Failed to initialize LLM client: {e}")
             raise
         
-        self.session_service = InMemorySessionService()
+        self.session_service = (
+            RedisSessionService(redis_url=api_config.redis_url)
+            if api_config.redis_url
+            else InMemorySessionService()
+        )
 
         self.analysis = AnalysisAgent(client=self.client)
         self.inventory = InventoryAgentReAct(
@@ -69,8 +169,164 @@ class MultiAgentsReAct:
 
         self.tool_executor = create_tool_executor_for_pipeline(
             check_inventory_func=check_inventory_detail,
-            create_order_func=create_customer_order
+            create_order_func=create_customer_order,
+            check_inventory_async=check_inventory_detail_async,
+            create_order_async_func=create_customer_order_async
+        )
+
+        # Agent names are looked up on every turn; resolve them once
+        self._agent_names: Dict[Runner, str] = {
+            runner: getattr(runner.agent, "name", "agent")
+            for runner in (self.analysis_runner, self.inventory_runner, self.order_runner, self.consultant_runner)
+        }
+
+        # "agent_name:sha256(prompt)" -> output, only for temperature-0 agents without
+        # side effects; order (creates orders) and consultant are never cached
+        self._agent_cache = TTLCache(_AGENT_CACHE_MAXSIZE)
+        self._cacheable_agents = frozenset(
+            self._agent_names[runner] for runner in (self.analysis_runner, self.inventory_runner)
+        )
+
+        # (user_id, session_id, agent_name) -> agent sub-session; keyed by conversation so
+        # customers sharing a user_id never see each other's history, and by user so a
+        # session_id sent by another user never resolves to this user's session. Only used
+        # with in-memory sessions: Redis sessions expire and are shared across workers,
+        # so they are looked up on every turn
+        self._session_cache: Optional[OrderedDict[Tuple[str, str, str], Session]] = (
+            None if isinstance(self.session_service, RedisSessionService) else OrderedDict()
+        )
+
+    @staticmethod
+    def _agent_cache_key(agent_name: str, prompt: str) -> str:
+        return f"{agent_name}:{hashlib.sha256(prompt.encode()).hexdigest()}"
+
+    def _get_cached_agent_output(self, agent_name: str, prompt: str) -> Optional[str]:
+        """Return a fresh cached output of a deterministic agent for this prompt, or None."""
+        if agent_name not in self._cacheable_agents:
+            return None
+        output = self._agent_cache.get(self._agent_cache_key(agent_name, prompt))
+        if output is not None:
+            logger.debug(f"Agent cache hit for {agent_name}")
+        return output
+
+    def _cache_agent_output(self, agent_name: str, prompt: str, output: str):
+        """Store a deterministic agent's output for the agent cache TTL."""
+        if not output or agent_name not in self._cacheable_agents:
+            return
+        self._agent_cache.set(self._agent_cache_key(agent_name, prompt), output, cache_config.agent_cache_ttl)
+
+    async def _get_agent_session(self, user_id: str, session_id_base: str, agent_name: str) -> Session:
+        """Return the agent's sub-session for a conversation, creating it on first use."""
+        key = (user_id, session_id_base, agent_name)
+        if self._session_cache is not None:
+            agent_session = self._session_cache.get(key)
+            if agent_session is not None:
+                self._session_cache.move_to_end(key)
+                return agent_session
+
+        agent_session_id = f"{session_id_base}:{agent_name}"
+        agent_session = await self.session_service.get_session(
+            app_name=self.app_name,
+            user_id=user_id,
+            session_id=agent_session_id,
+        )
+        if agent_session is None:
+            try:
+                agent_session = await self.session_service.create_session(
+                    app_name=self.app_name,
+                    user_id=user_id,
+                    session_id=agent_session_id,
+                )
+            except AlreadyExistsError:
+                # Created concurrently by another request or worker
+                agent_session = await self.session_service.get_session(
+                    app_name=self.app_name,
+                    user_id=user_id,
+                    session_id=agent_session_id,
+                )
+        if self._session_cache is None:
+            return agent_session
+        self._session_cache[key] = agent_session
+        if len(self._session_cache) > _AGENT_SESSION_CACHE_MAXSIZE:
+            self._session_cache.popitem(last=False)
+        return agent_session
+
+    async def _collect_response(
+        self,
+        runner: Runner,
+        user_id: str,
+        session_id: str,
+        message: types.Content,
+        fast_stop: bool = False
+    ) -> str:
+        """
+        Run one agent turn and return its text.
+        
+        With `fast_stop`, partial chunks are accumulated and the run is closed as
+        soon as they form a complete JSON object, without waiting for the final event.
+        The runner only persists final events, so the early answer is appended to the
+        session here to keep the conversation history complete.
+        """
+        if not fast_stop:
+            async with aclosing(runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=message,
+            )) as events:
+                async for event in events:
+                    if event.is_final_response():
+                        if event.content and event.content.parts:
+                            return event.content.parts[0].text or ""
+                        return ""
+            return ""
+
+        chunks = []
+        early_event = None
+        async with aclosing(runner.run_async(
+            user_id=user_id,
+            session_id=session_id,
+            new_message=message,
+            run_config=_STREAMING_RUN_CONFIG,
+        )) as events:
+            async for event in events:
+                text = event.content.parts[0].text if event.content and event.content.parts else None
+                if event.partial:
+                    if text:
+                        chunks.append(text)
+                        if text.rstrip().endswith("}") and _is_complete_json("".join(chunks)):
+                            logger.debug("Complete JSON received, stopping stream early")
+                            early_event = event
+                            break
+                    continue
+                if event.is_final_response():
+                    return text or "".join(chunks)
+
+        response_text = "".join(chunks)
+        if early_event is not None:
+            await self._append_model_answer(user_id, session_id, early_event, response_text)
+        return response_text
+
+    async def _append_model_answer(
+        self,
+        user_id: str,
+        session_id: str,
+        partial_event: Event,
+        text: str
+    ):
+        """Persist an answer taken from partial events as the turn's final model event."""
+        session = await self.session_service.get_session(
+            app_name=self.app_name,
+            user_id=user_id,
+            session_id=session_id,
         )
+        if session is None:
+            return
+        await self.session_service.append_event(session, Event(
+            invocation_id=partial_event.invocation_id,
+            author=partial_event.author,
+            branch=partial_event.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+        ))
 
     async def _run_agent_with_tool_support(
         self,
@@ -78,7 +334,8 @@ class MultiAgentsReAct:
         prompt: str,
         session_user_id: str,
         session_id_base: str,
-        max_iterations: int = 3
+        max_iterations: int = 3,
+        fast_stop: bool = True
     ) -> str:
         """
         Run agent with tool calling support using ReAct pattern.
@@ -89,42 +346,43 @@ class MultiAgentsReAct:
             session_user_id: User ID for session
             session_id_base: Base session ID
             max_iterations: Maximum tool calling iterations
+            fast_stop: Return as soon as the streamed output is complete JSON
             
         Returns:
             Final agent response
         """
-        agent_name = getattr(runner.agent, "name", "agent")
-        agent_session = await self.session_service.create_session(
-            app_name=self.app_name,
-            user_id=session_user_id,
-            session_id=f"{session_id_base}:{agent_name}",
-        )
+        agent_name = self._agent_names.get(runner) or getattr(runner.agent, "name", "agent")
+        cached_output = self._get_cached_agent_output(agent_name, prompt)
+        if cached_output is not None:
+            return cached_output
+
+        agent_session = await self._get_agent_session(session_user_id, session_id_base, agent_name)
 
         current_prompt = prompt
+        tool_failed = False
         
         for iteration in range(max_iterations):
             logger.info(f"Agent {agent_name} - Iteration {iteration + 1}/{max_iterations}")
             
             message = types.Content(role="user", parts=[types.Part(text=current_prompt)])
-            response_text = ""
-            
-            async for event in runner.run_async(
-                user_id=agent_session.user_id,
-                session_id=agent_session.id,
-                new_message=message,
-            ):
-                if getattr(event, "is_final_response", False):
-                    if event.content and event.content.parts:
-                        response_text = event.content.parts[0].text
-                    break
+            response_text = await self._collect_response(
+                runner,
+                agent_session.user_id,
+                agent_session.id,
+                message,
+                fast_stop=fast_stop
+            )
             
-            logger.debug(f"Agent {agent_name} output: {response_text}")
+            logger.opt(lazy=True).debug("Agent {} output: {}", lambda: agent_name, lambda: response_text)
             
-            tool_result = self.tool_executor.process_agent_output(response_text)
+            tool_result = await self.tool_executor.process_agent_output_async(response_text)
+            tool_calls = tool_result["tool_calls"]
+            # A transient tool failure must not be replayed from the cache
+            tool_failed = tool_failed or any(_is_tool_error(tool_call["tool_result"]) for tool_call in tool_calls)
             
-            if tool_result["tool_called"]:
+            if len(tool_calls) == 1:
                 tool_name = tool_result["tool_name"]
-                tool_output = tool_result["tool_result"]
+                tool_output = _tool_result_text(tool_result["tool_result"])
                 
                 logger.info(f"Tool called: {tool_name}")
                 
@@ -133,8 +391,22 @@ class MultiAgentsReAct:
                     f"{tool_output}\n\n"
                     f"Hãy sử dụng kết quả này để hoàn thành nhiệm vụ và trả về JSON như yêu cầu."
                 )
+            elif tool_calls:
+                logger.info(f"Tools called: {[tool_call['tool_name'] for tool_call in tool_calls]}")
+                
+                results_text = "\n".join(
+                    f"{i}. {tool_call['tool_name']}({orjson.dumps(tool_call['args']).decode()}):\n{_tool_result_text(tool_call['tool_result'])}"
+                    for i, tool_call in enumerate(tool_calls, start=1)
+                )
+                current_prompt = (
+                    f"Bạn đã gọi {len(tool_calls)} tool và nhận được các kết quả:\n"
+                    f"{results_text}\n\n"
+                    f"Hãy sử dụng các kết quả này để hoàn thành nhiệm vụ và trả về JSON như yêu cầu."
+                )
             else:
                 logger.info(f"No tool call detected, returning final response")
+                if not tool_failed:
+                    self._cache_agent_output(agent_name, prompt, response_text)
                 return response_text
         
         logger.warning(f"Agent {agent_name} reached max iterations ({max_iterations})")
@@ -150,128 +422,156 @@ class MultiAgentsReAct:
         """Run the multi-agent pipeline with ReAct pattern."""
         try:
             if session_id is None:
-                import uuid
                 session_id = str(uuid.uuid4())
 
-            session = await self.session_service.create_session(
-                app_name=self.app_name,
-                user_id=user_id,
-                session_id=session_id,
-            )
-            logger.debug(f"Session created: {session.id}")
+            # No agent runs on a root session, so only the per-agent sub-sessions are
+            # needed; open them in one concurrent round instead of one by one
+            await asyncio.gather(*(
+                self._get_agent_session(user_id, session_id, agent_name)
+                for agent_name in self._agent_names.values()
+            ))
+            logger.debug(f"Agent sessions ready for: {session_id}")
 
-            async def _run_agent_simple(runner: Runner, prompt: str) -> str:
-                """Run agent without tool support (for analysis and consultant)."""
-                agent_name = getattr(runner.agent, "name", "agent")
-                agent_session = await self.session_service.create_session(
-                    app_name=self.app_name,
-                    user_id=session.user_id,
-                    session_id=f"{session.id}:{agent_name}",
-                )
+            async def _run_agent_simple(
+                runner: Runner, prompt: str, fast_stop: bool = False, cache_output: bool = True
+            ) -> str:
+                """Run agent without tool support (for analysis and consultant).
+
+                With `cache_output=False` the caller caches the output once it has validated it.
+                """
+                agent_name = self._agent_names.get(runner) or getattr(runner.agent, "name", "agent")
+                cached_output = self._get_cached_agent_output(agent_name, prompt)
+                if cached_output is not None:
+                    return cached_output
+
+                agent_session = await self._get_agent_session(user_id, session_id, agent_name)
 
                 message = types.Content(role="user", parts=[types.Part(text=prompt)])
-                response_text = ""
-                async for event in runner.run_async(
-                    user_id=agent_session.user_id,
-                    session_id=agent_session.id,
-                    new_message=message,
-                ):
-                    if getattr(event, "is_final_response", False):
-                        if event.content and event.content.parts:
-                            response_text = event.content.parts[0].text
-                        break
+                response_text = await self._collect_response(
+                    runner,
+                    agent_session.user_id,
+                    agent_session.id,
+                    message,
+                    fast_stop=fast_stop
+                )
+                if cache_output:
+                    self._cache_agent_output(agent_name, prompt, response_text)
                 return response_text
 
             agent_outputs = []
 
+            # Serialize the context once with sorted keys; every prompt below reuses it
+            context_json = orjson.dumps(initial_context_data, option=orjson.OPT_SORT_KEYS).decode() if initial_context_data else ""
+            customer_context = f"Customer context: {context_json}\n" if context_json else ""
+
             # Step 1: Analysis Agent
-            analysis_prompt = query if not initial_context_data else (
-                f"Context: {json.dumps(initial_context_data, ensure_ascii=False)}\n"
-                f"Câu hỏi khách hàng: {query}"
+            analysis_prompt = query if not context_json else (
+                _ANALYSIS_TMPL % {"context": context_json, "query": query}
             )
-            analysis_result = await _run_agent_simple(self.analysis_runner, analysis_prompt)
-            agent_outputs.append({"agent": "analysis_agent", "output": analysis_result})
-            logger.debug(f"Analysis output: {analysis_result}")
+            classified_data, confidence = classify_intent(query)
+            get_metrics_collector().record_classifier(hit=confidence >= _CLASSIFIER_MIN_CONFIDENCE)
+            if confidence >= _CLASSIFIER_MIN_CONFIDENCE:
+                logger.debug(f"Intent classifier hit ({confidence}), skipping Analysis Agent")
+                analysis = AnalysisSchema.model_validate(classified_data)
+                analysis_result = orjson.dumps(classified_data).decode()
+            else:
+                # Analysis outputs are cached only once they validate, so a bad answer is never replayed
+                analysis_agent = self._agent_names[self.analysis_runner]
+                analysis_result = await _run_agent_simple(
+                    self.analysis_runner, analysis_prompt, fast_stop=True, cache_output=False
+                )
+                logger.opt(lazy=True).debug("Analysis output: {}", lambda: analysis_result)
 
-            try:
-                analysis_data = json.loads(analysis_result) if analysis_result else {}
-            except json.JSONDecodeError:
-                analysis_data = {}
-                logger.warning("Analysis output could not be parsed as JSON.")
+                try:
+                    analysis = AnalysisSchema.model_validate(extract_json_object(analysis_result))
+                    self._cache_agent_output(analysis_agent, analysis_prompt, analysis_result)
+                except ValueError as e:
+                    # Defaulting to {} would skip inventory and order; ask once more instead
+                    logger.warning(f"Analysis output invalid, retrying with stricter prompt: {e}")
+                    retry_prompt = _ANALYSIS_RETRY_TMPL % {"prompt": analysis_prompt}
+                    analysis_result = await _run_agent_simple(
+                        self.analysis_runner, retry_prompt, fast_stop=True, cache_output=False
+                    )
+                    logger.opt(lazy=True).debug("Analysis retry output: {}", lambda: analysis_result)
+                    try:
+                        analysis = AnalysisSchema.model_validate(extract_json_object(analysis_result))
+                        self._cache_agent_output(analysis_agent, retry_prompt, analysis_result)
+                    except ValueError as e:
+                        analysis = None
+                        logger.warning(f"Analysis output could not be parsed as JSON: {e}")
+
+            analysis_data = analysis.model_dump() if analysis else {}
+            agent_outputs.append(AgentOutput("analysis", analysis_result))
+
+            requires_inventory = analysis_data.get("requires_inventory_check")
+            requires_order = analysis_data.get("requires_order_placement")
 
             # Step 2: Inventory Agent (with ReAct tool calling)
-            inventory_result = ""
-            if analysis_data.get("requires_inventory_check"):
-                inventory_prompt = (
-                    "Dựa trên kết quả phân tích sau, hãy kiểm tra tồn kho:\n"
-                    f"{analysis_result}\n\n"
-                    "Hãy gọi tool check_inventory_detail với format:\n"
-                    "TOOL_CALL: check_inventory_detail\n"
-                    'ARGS: {"product": "...", "storage": "...", "color": "..."}'
-                )
+            async def _inventory_step() -> str:
+                inventory_prompt = _INVENTORY_TMPL % {"analysis": analysis_result}
                 inventory_result = await self._run_agent_with_tool_support(
                     self.inventory_runner,
                     inventory_prompt,
-                    session.user_id,
-                    session.id,
+                    user_id,
+                    session_id,
                     max_iterations=3
                 )
-                agent_outputs.append({"agent": "inventory_agent", "output": inventory_result})
-                logger.debug(f"Inventory output: {inventory_result}")
+                logger.opt(lazy=True).debug("Inventory output: {}", lambda: inventory_result)
+                return inventory_result
 
             # Step 3: Order Agent (with ReAct tool calling)
-            order_result = ""
-            if analysis_data.get("requires_order_placement"):
-                customer_context = (
-                    f"Customer context: {json.dumps(initial_context_data, ensure_ascii=False)}\n"
-                    if initial_context_data
-                    else ""
-                )
-
-                order_prompt = (
-                    "Khởi tạo đơn hàng dựa trên thông tin sau:\n"
-                    f"Analysis: {analysis_result}\n"
-                    f"Inventory: {inventory_result or 'Không có'}\n"
-                    f"{customer_context}\n"
-                    "Hãy gọi tool create_customer_order với format:\n"
-                    "TOOL_CALL: create_customer_order\n"
-                    'ARGS: {"order_details": {...}}'
-                )
+            async def _order_step(inventory_result: str) -> str:
+                order_prompt = _ORDER_TMPL % {
+                    "analysis": analysis_result,
+                    "inventory": inventory_result or "Không có",
+                    "customer_context": customer_context,
+                }
                 order_result = await self._run_agent_with_tool_support(
                     self.order_runner,
                     order_prompt,
-                    session.user_id,
-                    session.id,
+                    user_id,
+                    session_id,
                     max_iterations=3
                 )
-                agent_outputs.append({"agent": "order_agent", "output": order_result})
-                logger.debug(f"Order output: {order_result}")
+                logger.opt(lazy=True).debug("Order output: {}", lambda: order_result)
+                return order_result
 
-            # Step 4: Consultant Agent
-            customer_context_consultant = (
-                f"Customer context: {json.dumps(initial_context_data, ensure_ascii=False)}\n"
-                if initial_context_data
-                else ""
-            )
+            inventory_result = ""
+            order_result = ""
+            if requires_inventory and requires_order and not analysis_data.get("depends_on_inventory", True):
+                # Order does not need stock/price data: overlap both LLM round-trips
+                results = await asyncio.gather(
+                    _inventory_step(), _order_step(""), return_exceptions=True
+                )
+                for step_result in results:
+                    if isinstance(step_result, BaseException):
+                        raise step_result
+                inventory_result, order_result = results
+            else:
+                if requires_inventory:
+                    inventory_result = await _inventory_step()
+                if requires_order:
+                    order_result = await _order_step(inventory_result)
 
-            consultant_prompt = (
-                "Sinh câu trả lời cuối cùng cho khách hàng dựa trên thông tin:\n"
-                f"Customer query: {query}\n"
-                f"Analysis: {analysis_result}\n"
-                f"Inventory: {inventory_result or 'Không kiểm tra'}\n"
-                f"Order: {order_result or 'Chưa tạo đơn'}\n"
-                f"{customer_context_consultant}"
-                "Trả lời thân thiện bằng tiếng Việt."
-            )
+            if requires_inventory:
+                agent_outputs.append(AgentOutput("inventory", inventory_result))
+            if requires_order:
+                agent_outputs.append(AgentOutput("order", order_result))
+
+            # Step 4: Consultant Agent
+            consultant_prompt = _CONSULTANT_TMPL % {
+                "query": query,
+                "analysis": analysis_result,
+                "inventory": inventory_result or "Không kiểm tra",
+                "order": order_result or "Chưa tạo đơn",
+                "customer_context": customer_context,
+            }
             final_response = await _run_agent_simple(self.consultant_runner, consultant_prompt)
-            agent_outputs.append({"agent": "consultant_agent", "output": final_response})
+            agent_outputs.append(AgentOutput("consultant", final_response))
 
             result = {
                 "customer_response": final_response or "Xin lỗi, tôi không thể xử lý yêu cầu của bạn lúc này.",
-                "task1_output": agent_outputs[0] if len(agent_outputs) > 0 else None,
-                "task2_output": agent_outputs[1] if len(agent_outputs) > 1 else None,
-                "task3_output": agent_outputs[2] if len(agent_outputs) > 2 else None,
-                "task4_output": agent_outputs[3] if len(agent_outputs) > 3 else None,
+                "agent_outputs": tuple(agent_outputs),
                 "session_id": session_id,
                 "status": "success",
             }
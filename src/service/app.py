@@ -1,29 +1,97 @@
+import sys
+import time
+import asyncio
 import uvicorn
 from loguru import logger
 from fastapi import FastAPI, HTTPException
+from typing import List
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from src.pipeline_react import MultiAgentsReAct
-from src.config.schemas import ChatRequest, ChatResponse
+from src.config.settings import cache_config
+from src.db.redis_session import RedisSessionService
+from src.config.schemas import ChatRequest, ChatBatchRequest, ChatResponse
+from src.utils.llm_cache import LLMCache, is_cacheable_response
+from src.utils.semantic_cache import SemanticCache
+from src.utils.http_client import close_shared_client
+from src.tools import mcp_pool
 from src.utils.metrics import get_metrics_collector, RequestTimer, record_request_metric
 
+# Minimum seconds between background MCP re-probes while running degraded
+_MCP_REPROBE_INTERVAL = 10.0
+
+async def _reprobe_mcp(app: FastAPI):
+    """Ping MCP in the background and record the result for /health."""
+    try:
+        app.state.mcp_ready = await mcp_pool.ping()
+        if app.state.mcp_ready:
+            logger.info("MCP connection recovered")
+    finally:
+        app.state.mcp_last_probe = time.monotonic()
+        app.state.mcp_probe_task = None
+
+def _schedule_mcp_reprobe(app: FastAPI):
+    """Start a background MCP re-probe unless one is running or ran recently."""
+    if getattr(app.state, 'mcp_probe_task', None) is not None:
+        return
+    if time.monotonic() - getattr(app.state, 'mcp_last_probe', 0.0) < _MCP_REPROBE_INTERVAL:
+        return
+    app.state.mcp_probe_task = asyncio.create_task(_reprobe_mcp(app))
+
 async def startup_hook(app: FastAPI):
     """Initialize multi-agent system on startup."""
+    # Hand log records to a background writer so request handlers never block on I/O
+    logger.remove()
+    logger.add(sys.stderr, level="INFO", enqueue=True)
+    logger.add("logs/app.log", level="INFO", enqueue=True, rotation="100 MB", retention=5)
+    
     try:
         app.state.multi_agents = MultiAgentsReAct()
+        app.state.response_cache = (
+            LLMCache(
+                SemanticCache(
+                    cache_config.semantic_cache_model if cache_config.semantic_cache_enabled else None,
+                    threshold=cache_config.semantic_cache_threshold,
+                ),
+                ttl_seconds=cache_config.response_cache_ttl,
+            )
+            if cache_config.response_cache_ttl > 0
+            else None
+        )
         logger.info("Multi Agents system started successfully")
     except Exception as e:
         logger.error(f"Failed to start Multi Agents: {e}", exc_info=True)
         raise
+    
+    # Open the MCP session now so the first request does not pay the handshake;
+    # an unreachable MCP server only degrades health, it does not block boot
+    app.state.mcp_ready = await mcp_pool.ping()
+    app.state.mcp_last_probe = time.monotonic()
+    app.state.mcp_probe_task = None
+    if app.state.mcp_ready:
+        logger.info("MCP session warmed")
+    else:
+        logger.warning("MCP server unreachable at startup, running degraded")
 
 async def shutdown_hook(app: FastAPI):
     """Cleanup on shutdown."""
     metrics = get_metrics_collector()
     metrics.log_metrics()
     
+    session_service = getattr(app.state.multi_agents, 'session_service', None)
+    if isinstance(session_service, RedisSessionService):
+        await session_service.close()
+    
     app.state.multi_agents = None
+    app.state.response_cache = None
+    probe_task = getattr(app.state, 'mcp_probe_task', None)
+    if probe_task is not None:
+        probe_task.cancel()
+    await mcp_pool.close_sessions()
+    await close_shared_client()
     logger.info("Multi Agents system shut down")
+    await logger.complete()
     
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -50,6 +118,7 @@ async def root():
         "status": "running",
         "endpoints": {
             "chat": "/chat",
+            "chat_batch": "/chat/batch",
             "health": "/health",
             "metrics": "/metrics",
             "docs": "/docs"
@@ -64,9 +133,23 @@ async def health_check():
     try:
         is_healthy = hasattr(app.state, 'multi_agents') and app.state.multi_agents is not None
         
+        # Re-check a degraded MCP connection in the background so recovery shows up
+        # without a restart; probes never wait on it and get the last known state
+        if is_healthy and not getattr(app.state, 'mcp_ready', False):
+            _schedule_mcp_reprobe(app)
+        mcp_ready = getattr(app.state, 'mcp_ready', False)
+        
+        if not is_healthy:
+            status = "unhealthy"
+        elif not mcp_ready:
+            status = "degraded"
+        else:
+            status = "healthy"
+        
         return {
-            "status": "healthy" if is_healthy else "unhealthy",
-            "multi_agents_initialized": is_healthy
+            "status": status,
+            "multi_agents_initialized": is_healthy,
+            "mcp_connected": mcp_ready
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -93,6 +176,68 @@ async def get_metrics():
             content={"error": str(e)}
         )
 
+def _ensure_ready():
+    """Raise 503 until the multi-agent system is initialized."""
+    if not hasattr(app.state, 'multi_agents') or app.state.multi_agents is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Multi-agent system is not initialized"
+        )
+
+async def _process_chat(request: ChatRequest) -> ChatResponse:
+    """Answer one chat request from the response cache or the multi-agent pipeline."""
+    user_id = request.user_id or "default_user"
+    
+    # Serve repeated questions from the response cache. Answers depend on earlier turns,
+    # so entries are scoped to the caller's conversation and never handed to another one.
+    cache = getattr(app.state, 'response_cache', None) if request.session_id else None
+    if cache is not None:
+        cached = await asyncio.to_thread(
+            cache.get, request.query, request.initial_context_data, user_id, request.session_id
+        )
+        get_metrics_collector().record_cache(hit=cached is not None)
+        if cached is not None:
+            logger.info("✅ Served chat request from response cache")
+            return cached.model_copy(
+                update={"session_id": request.session_id, "token_usage": None}
+            )
+    
+    # Process query
+    response = await app.state.multi_agents.run(
+        query=request.query,
+        initial_context_data=request.initial_context_data,
+        user_id=user_id,
+        session_id=request.session_id
+    )
+    
+    # Build response
+    chat_response = ChatResponse(
+        customer_response=response.get('customer_response', ''),
+        status=response.get('status', 'unknown'),
+        session_id=response.get('session_id'),
+        token_usage=response.get('token_usage'),
+        error=response.get('error')
+    )
+    
+    if cache is not None and is_cacheable_response(response):
+        await asyncio.to_thread(
+            cache.set, request.query, chat_response, request.initial_context_data, user_id, request.session_id
+        )
+    
+    return chat_response
+
+def _record_chat_metric(chat_response: ChatResponse, response_time: float):
+    """Record the outcome of one chat response."""
+    success = chat_response.status == 'success'
+    tokens = chat_response.token_usage.get('total_tokens', 0) if chat_response.token_usage else 0
+    
+    record_request_metric(
+        success=success,
+        response_time=response_time,
+        tokens_used=tokens,
+        error_type=chat_response.error if not success else None
+    )
+
 @app.post("/chat", response_model=ChatResponse, summary="Chat with Multi Agents")
 async def chat(request: ChatRequest):
     """
@@ -110,45 +255,18 @@ async def chat(request: ChatRequest):
     with RequestTimer("chat_request") as timer:
         try:
             # Validate system is ready
-            if not hasattr(app.state, 'multi_agents') or app.state.multi_agents is None:
-                raise HTTPException(
-                    status_code=503,
-                    detail="Multi-agent system is not initialized"
-                )
+            _ensure_ready()
             
             # Log request
             logger.info(f"Processing chat request: {request.query[:100]}...")
             
-            # Process query
-            response = await app.state.multi_agents.run(
-                query=request.query,
-                initial_context_data=request.initial_context_data,
-                user_id=request.user_id or "default_user",
-                session_id=request.session_id
-            )
-            
-            # Build response
-            chat_response = ChatResponse(
-                customer_response=response.get('customer_response', ''),
-                status=response.get('status', 'unknown'),
-                session_id=response.get('session_id'),
-                token_usage=response.get('token_usage'),
-                error=response.get('error')
-            )
+            chat_response = await _process_chat(request)
             
             # Record metrics
-            success = chat_response.status == 'success'
-            tokens = chat_response.token_usage.get('total_tokens', 0) if chat_response.token_usage else 0
-            
-            record_request_metric(
-                success=success,
-                response_time=timer.get_elapsed(),
-                tokens_used=tokens,
-                error_type=chat_response.error if not success else None
-            )
+            _record_chat_metric(chat_response, timer.get_elapsed())
             
             # Log result
-            if success:
+            if chat_response.status == 'success':
                 logger.info(f"✅ Successfully processed request for session: {chat_response.session_id}")
             else:
                 logger.warning(f"⚠️ Request completed with errors: {chat_response.error}")
@@ -174,6 +292,61 @@ async def chat(request: ChatRequest):
                 detail=f"Internal server error: {str(e)}"
             )
 
+@app.post("/chat/batch", response_model=List[ChatResponse], summary="Chat with Multi Agents in batch")
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Process several customer queries concurrently through the multi-agent system.
+    
+    Args:
+        request (ChatBatchRequest): Chat requests and the concurrency limit
+        
+    Returns:
+        List[ChatResponse]: One response per request, in request order
+        
+    Raises:
+        HTTPException: If the system is not initialized
+    """
+    _ensure_ready()
+    logger.info(f"Processing chat batch of {len(request.requests)} requests")
+    
+    semaphore = asyncio.Semaphore(request.max_concurrency)
+    timers = []
+    
+    async def _process_one(item: ChatRequest) -> ChatResponse:
+        async with semaphore:
+            # Time the request itself, not the wait for a concurrency slot
+            with RequestTimer("chat_batch_item") as timer:
+                timers.append(timer)
+                return await _process_chat(item)
+    
+    results = await asyncio.gather(
+        *map(_process_one, request.requests), return_exceptions=True
+    )
+    
+    responses = []
+    for item, result in zip(request.requests, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Error processing batch item: {result}")
+            result = ChatResponse(
+                customer_response="",
+                status="error",
+                session_id=item.session_id,
+                error=str(result)
+            )
+        responses.append(result)
+    
+    # Record the whole batch in one update with the summed per-request times
+    failed = [r for r in responses if r.status != 'success']
+    get_metrics_collector().record_batch(
+        successes=len(responses) - len(failed),
+        errors=len(failed),
+        response_time_sum=sum(timer.get_elapsed() for timer in timers),
+        error_types=[r.error for r in failed if r.error],
+        tokens=sum(r.token_usage.get('total_tokens', 0) for r in responses if r.token_usage)
+    )
+    
+    return responses
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler."""
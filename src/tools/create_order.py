@@ -1,9 +1,9 @@
-import json
+import orjson
 import asyncio
 from loguru import logger
 from typing import Dict, Any
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+
+from src.tools.mcp_pool import TRANSPORT_ERRORS, get_session, reset_session, run_sync
 
 
 async def create_order_async(
@@ -15,47 +15,48 @@ async def create_order_async(
     last_error = None
     
     for attempt in range(max_retries):
+        session = None
         try:
             logger.info(f"Attempt {attempt + 1}/{max_retries} to create order")
-            logger.debug(f"Order details: {order_details}")
+            logger.opt(lazy=True).debug("Order details: {}", lambda: order_details)
+            
+            session = await get_session(timeout=timeout)
+            result = await asyncio.wait_for(
+                session.call_tool("create_order", {"order_details": order_details}),
+                timeout=timeout
+            )
             
-            async with sse_client(url="http://localhost:8000/sse") as (read, write):
-                async with ClientSession(read, write) as session:
-                    await asyncio.wait_for(session.initialize(), timeout=timeout)
-                    logger.info(f"MCP session initialized")
-                    
-                    result = await asyncio.wait_for(
-                        session.call_tool("create_order", {"order_details": order_details}),
-                        timeout=timeout
-                    )
-                    
-                    result_text = None
-                    if result and hasattr(result, 'content') and result.content:
-                        for content in result.content:
-                            if hasattr(content, 'text'):
-                                result_text = content.text
-                                break
-                    elif isinstance(result, str):
-                        result_text = result
-                    else:
-                        result_text = str(result)
-                    
-                    if result_text:
-                        if "successfully" in result_text.lower() or "success" in result_text.lower():
-                            logger.info(f"Successfully created order")
-                        elif "error" in result_text.lower():
-                            logger.error(f"Server returned error: {result_text}")
-                        return result_text
-                    else:
-                        raise ValueError("Empty response from server")
-                        
+            result_text = None
+            if result and hasattr(result, 'content') and result.content:
+                for content in result.content:
+                    if hasattr(content, 'text'):
+                        result_text = content.text
+                        break
+            elif isinstance(result, str):
+                result_text = result
+            else:
+                result_text = str(result)
+            
+            if result_text:
+                if "successfully" in result_text.lower() or "success" in result_text.lower():
+                    logger.info(f"Successfully created order")
+                elif "error" in result_text.lower():
+                    logger.error(f"Server returned error: {result_text}")
+                return result_text
+            else:
+                raise ValueError("Empty response from server")
+                
         except asyncio.TimeoutError:
             last_error = f"Timeout after {timeout}s"
             logger.warning(f"Timeout on attempt {attempt + 1}/{max_retries}")
-        except ConnectionError as e:
+            # A hung session would time out every later call too
+            await reset_session(session)
+        except TRANSPORT_ERRORS as e:
             last_error = f"Connection error: {str(e)}"
             logger.warning(f"Connection error on attempt {attempt + 1}/{max_retries}: {e}")
+            await reset_session(session)
         except Exception as e:
+            # The session is still healthy; keep it for concurrent callers
             last_error = str(e)
             logger.error(f"Error on attempt {attempt + 1}/{max_retries}: {e}", exc_info=True)
         
@@ -71,17 +72,31 @@ async def create_order_async(
 
 def create_order(order_details: Dict[str, Any]) -> str:
     """Synchronous wrapper for create_order_async."""
+    return run_sync(create_order_async(order_details))
+
+async def create_customer_order_async(order_details: Dict[str, Any]) -> str:
+    """Async variant of create_customer_order for callers already on an event loop."""
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, create_order_async(order_details))
-                return future.result()
-        else:
-            return loop.run_until_complete(create_order_async(order_details))
-    except RuntimeError:
-        return asyncio.run(create_order_async(order_details))
+        payload = order_details
+        if isinstance(order_details, str):
+            try:
+                payload = orjson.loads(order_details)
+            except orjson.JSONDecodeError as parse_error:
+                logger.error(f"Failed to parse order_details string: {parse_error}")
+                return f"Error: Invalid JSON string - {parse_error}"
+        
+        logger.opt(lazy=True).debug("Calling MCP create_order with: {}", lambda: payload)
+        
+        result = await create_order_async(payload)
+        
+        logger.opt(lazy=True).debug("MCP create_order result: {}", lambda: result)
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in create_customer_order_async: {e}", exc_info=True)
+        return f"Error: Failed to create order - {str(e)}"
+
 
 def create_customer_order(order_details: Dict[str, Any]) -> str:
     """
@@ -101,23 +116,4 @@ def create_customer_order(order_details: Dict[str, Any]) -> str:
     Returns:
         Success message with order file path or error message
     """
-    try:
-        payload = order_details
-        if isinstance(order_details, str):
-            try:
-                payload = json.loads(order_details)
-            except json.JSONDecodeError as parse_error:
-                logger.error(f"Failed to parse order_details string: {parse_error}")
-                return f"Error: Invalid JSON string - {parse_error}"
-        
-        logger.debug(f"Calling MCP create_order with: {payload}")
-        
-        result = create_order(payload)
-        
-        logger.debug(f"MCP create_order result: {result}")
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error in create_customer_order: {e}", exc_info=True)
-        return f"Error: Failed to create order - {str(e)}"
\ No newline at end of file
+    return run_sync(create_customer_order_async(order_details))
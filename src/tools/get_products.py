@@ -1,9 +1,9 @@
-import json
+import orjson
 import asyncio
 from loguru import logger
 from typing import Optional
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+
+from src.tools.mcp_pool import TRANSPORT_ERRORS, get_session, reset_session, run_sync
 
 
 async def get_product_info_async(
@@ -16,6 +16,7 @@ async def get_product_info_async(
     last_error = None
     
     for attempt in range(max_retries):
+        session = None
         try:
             logger.info(f"Attempt {attempt + 1}/{max_retries} to get product info")
             
@@ -25,40 +26,40 @@ async def get_product_info_async(
             if color:
                 kwargs["color"] = color
             
-            async with sse_client(url="http://localhost:8000/sse") as (read, write):
-                async with ClientSession(read, write) as session:
-                    await asyncio.wait_for(session.initialize(), timeout=timeout)
-                    logger.info(f"MCP session initialized")
-                    
-                    result = await asyncio.wait_for(
-                        session.call_tool("get_product_info", kwargs),
-                        timeout=timeout
-                    )
-                    
-                    result_text = None
-                    if result and hasattr(result, 'content') and result.content:
-                        for content in result.content:
-                            if hasattr(content, 'text'):
-                                result_text = content.text
-                                break
-                    elif isinstance(result, str):
-                        result_text = result
-                    else:
-                        result_text = str(result)
-                    
-                    if result_text:
-                        logger.info(f"Successfully retrieved product info")
-                        return result_text
-                    else:
-                        raise ValueError("Empty response from server")
-                        
+            session = await get_session(timeout=timeout)
+            result = await asyncio.wait_for(
+                session.call_tool("get_product_info", kwargs),
+                timeout=timeout
+            )
+            
+            result_text = None
+            if result and hasattr(result, 'content') and result.content:
+                for content in result.content:
+                    if hasattr(content, 'text'):
+                        result_text = content.text
+                        break
+            elif isinstance(result, str):
+                result_text = result
+            else:
+                result_text = str(result)
+            
+            if result_text:
+                logger.info(f"Successfully retrieved product info")
+                return result_text
+            else:
+                raise ValueError("Empty response from server")
+                
         except asyncio.TimeoutError:
             last_error = f"Timeout after {timeout}s"
             logger.warning(f"Timeout on attempt {attempt + 1}/{max_retries}")
-        except ConnectionError as e:
+            # A hung session would time out every later call too
+            await reset_session(session)
+        except TRANSPORT_ERRORS as e:
             last_error = f"Connection error: {str(e)}"
             logger.warning(f"Connection error on attempt {attempt + 1}/{max_retries}: {e}")
+            await reset_session(session)
         except Exception as e:
+            # The session is still healthy; keep it for concurrent callers
             last_error = str(e)
             logger.error(f"Error on attempt {attempt + 1}/{max_retries}: {e}", exc_info=True)
         
@@ -69,50 +70,46 @@ async def get_product_info_async(
     
     error_msg = f"Failed to get product info after {max_retries} attempts. Last error: {last_error}"
     logger.error(f"{error_msg}")
-    return json.dumps({"status": "error", "message": error_msg}, ensure_ascii=False)
+    return orjson.dumps({"status": "error", "message": error_msg}).decode()
 
 
 def get_product_info(product: str, storage: Optional[str] = None, color: Optional[str] = None) -> str:
     """Synchronous wrapper for get_product_info_async."""
+    return run_sync(get_product_info_async(product, storage, color))
+
+
+async def check_inventory_detail_async(product: str, storage: Optional[str], color: Optional[str]) -> str:
+    """Async variant of check_inventory_detail for callers already on an event loop."""
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, get_product_info_async(product, storage, color))
-                return future.result()
-        else:
-            return loop.run_until_complete(get_product_info_async(product, storage, color))
-    except RuntimeError:
-        return asyncio.run(get_product_info_async(product, storage, color))
+        logger.opt(lazy=True).debug(
+            "Calling MCP get_product_info: product={}, storage={}, color={}",
+            lambda: product, lambda: storage, lambda: color
+        )
+        
+        return await get_product_info_async(
+            product=product,
+            storage=storage if storage and storage.strip() else None,
+            color=color if color and color.strip() else None
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in check_inventory_detail_async: {e}", exc_info=True)
+        return orjson.dumps({
+            "status": "error",
+            "message": f"Failed to check inventory: {str(e)}"
+        }).decode()
 
 
-def check_inventory_detail(product: str, storage: str, color: str) -> str:
+def check_inventory_detail(product: str, storage: Optional[str], color: Optional[str]) -> str:
     """
     Check product inventory and pricing details.
     
     Args:
         product: Product name (e.g., 'iPhone 15 Pro Max')  
-        storage: Storage capacity (e.g., '256GB' or empty string '')
-        color: Color variant (e.g., 'Titan tự nhiên' or empty string '')
+        storage: Storage capacity (e.g., '256GB'), or empty string/None if unknown
+        color: Color variant (e.g., 'Titan tự nhiên'), or empty string/None if unknown
         
     Returns:
         JSON string with product details or error message
     """
-    try:
-        logger.debug(f"Calling MCP get_product_info: product={product}, storage={storage}, color={color}")
-        
-        result = get_product_info(
-            product=product, 
-            storage=storage if storage and storage.strip() else None, 
-            color=color if color and color.strip() else None
-        )
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error in check_inventory_detail: {e}", exc_info=True)
-        return json.dumps({
-            "status": "error",
-            "message": f"Failed to check inventory: {str(e)}"
-        }, ensure_ascii=False)
\ No newline at end of file
+    return run_sync(check_inventory_detail_async(product, storage, color))
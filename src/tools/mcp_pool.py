@@ -0,0 +1,159 @@
+"""
+Long-lived MCP client sessions, one per running event loop.
+
+`sse_client` and `ClientSession` are anyio context managers whose cancel scopes
+must be entered and exited by the same task, so each session is owned by a
+background task that keeps both contexts open until the session is reset.
+"""
+
+import asyncio
+import contextlib
+import weakref
+import anyio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, Optional, TypeVar
+from loguru import logger
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from src.config.settings import mcp_config
+
+T = TypeVar("T")
+
+# Errors that mean the SSE transport itself is broken. Anything else (bad arguments,
+# tool-side failures) leaves the shared session usable for concurrent callers.
+TRANSPORT_ERRORS = (
+    ConnectionError,
+    httpx.TransportError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+# Worker threads for sync callers that are themselves running inside an event loop
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="mcp-sync")
+
+
+class _LoopPool:
+    """Session state for a single event loop."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.session: Optional[ClientSession] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stop: Optional[asyncio.Event] = None
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopPool]" = weakref.WeakKeyDictionary()
+
+
+def _get_pool() -> _LoopPool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = _LoopPool()
+    return pool
+
+
+async def _hold_session(pool: _LoopPool, ready: asyncio.Event, stop: asyncio.Event):
+    """Open the SSE transport and session, then keep them alive until `stop` is set."""
+    try:
+        async with sse_client(url=mcp_config.mcp_url) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                pool.session = session
+                ready.set()
+                logger.info(f"MCP session opened: {mcp_config.mcp_url}")
+                await stop.wait()
+    except Exception as e:
+        logger.warning(f"MCP session closed: {e}")
+    finally:
+        if pool.task is asyncio.current_task():
+            pool.session = None
+        ready.set()
+
+
+def _stop(pool: _LoopPool):
+    if pool.stop is not None:
+        pool.stop.set()
+    pool.session = None
+
+
+async def get_session(timeout: float = 15) -> ClientSession:
+    """
+    Return the shared MCP session for the running event loop, connecting on first use.
+
+    Raises:
+        asyncio.TimeoutError: If the handshake does not finish within `timeout`
+        ConnectionError: If the server cannot be reached
+    """
+    pool = _get_pool()
+    async with pool.lock:
+        if pool.session is not None and pool.task is not None and not pool.task.done():
+            return pool.session
+
+        _stop(pool)
+        ready = asyncio.Event()
+        pool.stop = asyncio.Event()
+        pool.task = asyncio.get_running_loop().create_task(_hold_session(pool, ready, pool.stop))
+        try:
+            await asyncio.wait_for(ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pool.task.cancel()
+            raise
+
+        if pool.session is None:
+            raise ConnectionError(f"Could not connect to MCP server at {mcp_config.mcp_url}")
+        return pool.session
+
+
+async def reset_session(stale: Optional[ClientSession] = None):
+    """
+    Drop the current session so the next `get_session` reconnects.
+
+    With `stale`, nothing happens unless that session is still the current one,
+    so a caller failing on an old session cannot tear down a fresh reconnect.
+    """
+    pool = _pools.get(asyncio.get_running_loop())
+    if pool is None:
+        return
+    async with pool.lock:
+        if stale is not None and pool.session is not stale:
+            return
+        _stop(pool)
+
+
+async def close_sessions(timeout: float = 5):
+    """Close the session of the running event loop and wait for its owner task."""
+    pool = _pools.get(asyncio.get_running_loop())
+    if pool is None:
+        return
+    async with pool.lock:
+        _stop(pool)
+        task, pool.task = pool.task, None
+    if task is not None:
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(task, timeout=timeout)
+
+
+async def ping(timeout: float = 5) -> bool:
+    """Check that the MCP server answers on the shared session."""
+    try:
+        session = await get_session(timeout=timeout)
+        await asyncio.wait_for(session.send_ping(), timeout=timeout)
+        return True
+    except Exception as e:
+        logger.warning(f"MCP ping failed: {e}")
+        await reset_session()
+        return False
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run `coro` to completion from synchronous code."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Blocking the running loop on its own coroutine would deadlock; use a worker thread
+    return _EXECUTOR.submit(asyncio.run, coro).result()
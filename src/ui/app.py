@@ -1,10 +1,26 @@
 import re
-import json
+import time
+import uuid
+import orjson
 import asyncio
+import threading
+from functools import lru_cache
+from concurrent.futures import wait
+from collections import deque
 import streamlit as st
 from loguru import logger
 
+# libuv-based loop for the UI's background thread: cheaper socket scheduling for the
+# pipeline's concurrent LLM/tool calls, without replacing Streamlit's own loop policy
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from src.config.settings import cache_config
 from src.pipeline_a2a import A2APipeline
+from src.utils.llm_cache import LLMCache, is_cacheable_response
+from src.utils.semantic_cache import SemanticCache
 
 
 st.set_page_config(
@@ -14,7 +30,7 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-st.markdown("""
+_CSS_BLOCK = """
     <style>
         .chat-container {
             max-width: 1000px;
@@ -68,14 +84,14 @@ st.markdown("""
             flex-direction: column;
         }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+# Streamlit drops elements that a rerun does not emit, so the styles are sent every run
+st.markdown(_CSS_BLOCK, unsafe_allow_html=True)
 
 st.markdown("# :rainbow[Agentias - Multi-Agent System]")
 st.sidebar.header("Cài đặt")
 
-if "pipeline" not in st.session_state:
-    st.session_state.pipeline = A2APipeline()
-
 st.sidebar.subheader("Thông tin khách hàng")
 customer_name = st.sidebar.text_input("Tên khách hàng", value="Nguyễn Văn Trọng")
 customer_phone = st.sidebar.text_input("Số điện thoại", value="0987654321")
@@ -83,18 +99,67 @@ previous_interactions = st.sidebar.text_area("Lịch sử tương tác", value="
 
 show_details = st.sidebar.checkbox("Hiển thị chi tiết các bước", value=False)
 
+# Only the most recent messages are kept and rendered on each rerun
+CHAT_HISTORY_MAXLEN = 200
+INITIAL_BOT_MESSAGE = "Xin chào! Tôi là Agentias. Hôm nay tôi có thể giúp gì cho bạn?"
+
+_ORDER_TMPL = (
+    '<div class="order-details">'
+    '<strong>✅ Đơn hàng đã được tạo thành công!</strong><br><br>'
+    '<strong>Mã đơn hàng:</strong> {order_id}<br>'
+    '<strong>Sản phẩm:</strong> {product}<br>'
+    '<strong>Màu sắc:</strong> {color}<br>'
+    '<strong>Bộ nhớ:</strong> {storage}<br>'
+    '<strong>Số lượng:</strong> {quantity}<br>'
+    '<strong>Tổng giá:</strong> {total_price:,.0f} VNĐ<br>'
+    '<strong>Khách hàng:</strong> {customer_name}<br>'
+    '</div>'
+)
+
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
 def strip_ansi(text):
     """Loại bỏ mã ANSI escape từ chuỗi."""
-    ansi_regex = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_regex.sub('', text)
+    # Every sequence starts with ESC; most agent output has none
+    if '\x1b' not in text:
+        return text
+    return _ANSI_RE.sub('', text)
+
+@st.cache_resource
+def get_pipeline():
+    """One A2A pipeline per process, shared by all sessions (each run opens its own ADK session)."""
+    return A2APipeline()
+
+@st.cache_resource
+def get_event_loop():
+    """Process-wide event loop running on a daemon thread; every session submits to it."""
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="ui-event-loop", daemon=True).start()
+    return loop
+
+@st.cache_resource
+def get_response_cache():
+    """Process-wide exact-match cache of pipeline results (None when disabled)."""
+    if cache_config.response_cache_ttl <= 0:
+        return None
+    return LLMCache(SemanticCache(None, maxsize=256), ttl_seconds=cache_config.response_cache_ttl)
 
 async def query_processing_async(query_text, customer_context, pipeline):
     """Process query using A2A pipeline."""
+    cache = get_response_cache()
+    if cache is not None:
+        cached = cache.get(query_text, customer_context)
+        if cached is not None:
+            logger.info("Served query from UI response cache")
+            return cached
+
     try:
         result = await pipeline.run(
             query=query_text,
             customer_context=customer_context
         )
+        if cache is not None and is_cacheable_response(result):
+            cache.set(query_text, result, customer_context)
         return result
     except Exception as e:
         logger.error(f"Error in query processing: {e}", exc_info=True)
@@ -104,34 +169,46 @@ async def query_processing_async(query_text, customer_context, pipeline):
             "error": str(e)
         }
 
+@lru_cache(maxsize=256)
+def _parse_json_cached(value):
+    """Parse once per distinct string; the returned object is shared and must not be mutated."""
+    # Prose is the common case; don't pay for a failed parse + exception
+    stripped = value.lstrip()
+    if not stripped or stripped[0] not in "{[":
+        return None
+    try:
+        return orjson.loads(stripped)
+    except orjson.JSONDecodeError:
+        return None
+
 def _parse_json(value):
     if isinstance(value, dict):
         return value
     if isinstance(value, str):
-        try:
-            return json.loads(value)
-        except json.JSONDecodeError:
-            return None
+        return _parse_json_cached(value)
     return None
 
 
-def display_task_outputs(result, show_details):
-    """Display agent outputs when detail view is enabled."""
+def display_task_outputs(parsed_outputs, show_details):
+    """Display agent outputs when detail view is enabled.
+
+    `parsed_outputs` holds (task, parsed JSON or None) pairs, parsed once per query.
+    """
     if not show_details:
         return
 
-    agent_outputs = result.get("agent_outputs") or []
-    if not agent_outputs:
+    if not parsed_outputs:
         return
 
     with st.expander("Chi tiết các bước xử lý", expanded=False):
-        for idx, task in enumerate(agent_outputs, 1):
-            agent_name = task.get("agent", f"agent_{idx}")
-            output = task.get("output", "")
+        for idx, (task, parsed_output) in enumerate(parsed_outputs, 1):
+            agent_name = task.agent or f"agent_{idx}"
+            output = task.output or ""
 
-            st.markdown(f"**{idx}. {agent_name.title()}**")
+            # Separator and header share one element
+            header = f"**{idx}. {agent_name.title()}**"
+            st.markdown(f"---\n\n{header}" if idx > 1 else header)
 
-            parsed_output = _parse_json(output)
             if isinstance(parsed_output, dict) and parsed_output.get("fallback_used"):
                 st.caption("⚠️ Đã dùng dữ liệu fallback vì agent trả về định dạng không hợp lệ.")
 
@@ -142,86 +219,94 @@ def display_task_outputs(result, show_details):
                 display_text = clean_output[:500] + ("..." if isinstance(clean_output, str) and len(clean_output) > 500 else "")
                 st.code(display_text, language="text")
 
-            st.markdown("---")
+def _order_details_html(order_details):
+    """Render order details as an `order-details` HTML box."""
+    return _ORDER_TMPL.format(
+        order_id=order_details.get("order_id", "N/A"),
+        product=order_details.get("product", "Unknown"),
+        color=order_details.get("color", "Unknown"),
+        storage=order_details.get("storage", "Unknown"),
+        quantity=order_details.get("quantity", 1),
+        total_price=order_details.get("total_price", 0),
+        customer_name=order_details.get("customer_info", {}).get("customer_name", "Guest"),
+    )
 
 def display_order_details(order_details):
     """Display order details in a nice box."""
     if order_details:
-        order_html = (
-            f'<div class="order-details">'
-            f'<strong>✅ Đơn hàng đã được tạo thành công!</strong><br><br>'
-            f'<strong>Mã đơn hàng:</strong> {order_details.get("order_id", "N/A")}<br>'
-            f'<strong>Sản phẩm:</strong> {order_details.get("product", "Unknown")}<br>'
-            f'<strong>Màu sắc:</strong> {order_details.get("color", "Unknown")}<br>'
-            f'<strong>Bộ nhớ:</strong> {order_details.get("storage", "Unknown")}<br>'
-            f'<strong>Số lượng:</strong> {order_details.get("quantity", 1)}<br>'
-            f'<strong>Tổng giá:</strong> {order_details.get("total_price", 0):,.0f} VNĐ<br>'
-            f'<strong>Khách hàng:</strong> {order_details.get("customer_info", {}).get("customer_name", "Guest")}<br>'
-            f'</div>'
-        )
+        order_html = _order_details_html(order_details)
         st.markdown(f'<div class="chat-container"><div class="chat">{order_html}</div></div>', unsafe_allow_html=True)
 
+@lru_cache(maxsize=256)
+def _build_customer_context(conversation_id, name, phone, previous):
+    """Same inputs give the same (read-only) dict, so reruns don't rebuild it."""
+    return {
+        "conversation_id": conversation_id,
+        "customer_name": name,
+        "customer_phone": phone,
+        "previous_interactions": previous
+    }
+
+def _new_session():
+    """Start a new conversation id, keeping the short form shown in the sidebar."""
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.session_id_short = st.session_state.session_id[:13]
+
 def main():
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-        initial_bot_message = "Xin chào! Tôi là Agentias. Hôm nay tôi có thể giúp gì cho bạn?"
-        st.session_state.chat_history.append({"role": "assistant", "content": initial_bot_message})
+        st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_MAXLEN)
+        st.session_state.chat_history.append({"role": "assistant", "content": INITIAL_BOT_MESSAGE})
 
     if "session_id" not in st.session_state:
-        import uuid
-        st.session_state.session_id = str(uuid.uuid4())
+        _new_session()
         logger.info(f"New session created: {st.session_state.session_id}")
-    
-    # Tạo hoặc lấy event loop cho session này
-    if "event_loop" not in st.session_state:
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_closed():
-                raise RuntimeError("Loop is closed")
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        st.session_state.event_loop = loop
-
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+
+    # Render the whole history as one element instead of one per message
+    parts = ['<div class="chat-container">']
     for message in st.session_state.chat_history:
         if message["role"] == "user":
-            st.markdown(f'<div class="chat"><div class="user-message">{message["content"]}</div></div>', unsafe_allow_html=True)
+            parts.append(f'<div class="chat"><div class="user-message">{message["content"]}</div></div>')
         else:
-            st.markdown(f'<div class="chat"><div class="bot-message">{message["content"]}</div></div>', unsafe_allow_html=True)
-            
-            if "order_details" in message:
-                display_order_details(message["order_details"])
-    st.markdown('</div>', unsafe_allow_html=True)
+            parts.append(f'<div class="chat"><div class="bot-message">{message["content"]}</div></div>')
+
+            if message.get("order_details"):
+                parts.append(f'<div class="chat">{_order_details_html(message["order_details"])}</div>')
+    parts.append('</div>')
+    st.markdown("".join(parts), unsafe_allow_html=True)
 
     query_text = st.chat_input("Hỏi Agentias điều gì đó...")
     if query_text:
-        customer_context = {
-            "conversation_id": st.session_state.session_id,
-            "customer_name": customer_name,
-            "customer_phone": customer_phone,
-            "previous_interactions": previous_interactions
-        }
+        customer_context = _build_customer_context(
+            st.session_state.session_id, customer_name, customer_phone, previous_interactions
+        )
         
         st.session_state.chat_history.append({"role": "user", "content": query_text})
         st.markdown(f'<div class="chat-container"><div class="chat"><div class="user-message">{query_text}</div></div></div>', unsafe_allow_html=True)
         
         with st.spinner("Đang xử lý yêu cầu của bạn..."):
-            # Dùng loop đã tồn tại thay vì tạo mới
-            loop = st.session_state.event_loop
-            result = loop.run_until_complete(query_processing_async(
+            # Chạy trên event loop dùng chung của process
+            future = asyncio.run_coroutine_threadsafe(query_processing_async(
                 query_text, 
                 customer_context,
-                st.session_state.pipeline
-            ))
+                get_pipeline()
+            ), get_event_loop())
+            # The script thread only polls, so the page keeps updating while agents run
+            progress = st.empty()
+            started = time.monotonic()
+            while not future.done():
+                progress.caption(f"⏳ Đã xử lý {time.monotonic() - started:.0f}s...")
+                wait([future], timeout=0.5)
+            progress.empty()
+            result = future.result()
         
         final_answer = result.get("customer_response", "Xin lỗi, tôi không thể xử lý yêu cầu của bạn lúc này.")
 
+        # Parse every agent output once; order extraction and the detail view share it
+        parsed_outputs = [(task, _parse_json(task.output)) for task in result.get("agent_outputs") or ()]
+
         order_details = None
-        agent_outputs = result.get("agent_outputs") or []
-        for task in agent_outputs:
-            if task.get("agent") == "order":
-                parsed = _parse_json(task.get("output"))
+        for task, parsed in parsed_outputs:
+            if task.agent == "order":
                 if isinstance(parsed, dict) and parsed.get("order_created") and parsed.get("order_details"):
                     order_details = parsed.get("order_details") or {}
                     customer_info = parsed.get("customer_info") or {}
@@ -243,25 +328,23 @@ def main():
         if order_details:
             display_order_details(order_details)
         
-        display_task_outputs(result, show_details)
+        display_task_outputs(parsed_outputs, show_details)
         
         if result.get("status") == "success":
             st.sidebar.success(f"✅ Request processed successfully")
             st.sidebar.info(f"Session: {result.get('session_id', 'N/A')[:12]}...")
         else:
             st.sidebar.error(f"Error: {result.get('error', 'Unknown error')}")
-        
-        st.rerun()
 
 def health_check():
     st.sidebar.markdown("---")
     st.sidebar.header("Thông tin hệ thống")
     
     if "session_id" in st.session_state:
-        st.sidebar.text(f"Session: {st.session_state.session_id[:13]}...")
+        st.sidebar.text(f"Session: {st.session_state.session_id_short}...")
     
     if "chat_history" in st.session_state:
-        msg_count = len([m for m in st.session_state.chat_history if m["role"] == "user"])
+        msg_count = sum(1 for m in st.session_state.chat_history if m["role"] == "user")
         st.sidebar.text(f"💬 Messages: {msg_count}")
     
     if st.sidebar.button("🔍 Kiểm tra trạng thái"):
@@ -269,9 +352,8 @@ def health_check():
     
     # Reset conversation button
     if st.sidebar.button("🔄 Làm mới cuộc hội thoại"):
-        st.session_state.chat_history = []
-        import uuid
-        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_MAXLEN)
+        _new_session()
         st.sidebar.info("Đã tạo session mới!")
         st.rerun()
 
@@ -0,0 +1,47 @@
+"""
+Process-wide pooled HTTP client for LLM calls.
+"""
+
+import httpx
+import litellm
+from typing import Optional
+from loguru import logger
+
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it on first use (HTTP/2 when h2 is installed)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_HTTP2,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            timeout=httpx.Timeout(60.0),
+        )
+        logger.debug(f"Shared HTTP client created (http2={_HTTP2})")
+    return _client
+
+
+def install_litellm_client() -> httpx.AsyncClient:
+    """Route LiteLLM's OpenAI-compatible async calls through the shared client."""
+    client = get_shared_client()
+    litellm.aclient_session = client
+    return client
+
+
+async def close_shared_client():
+    """Close the shared client and detach it from LiteLLM."""
+    global _client
+    if _client is None:
+        return
+    if litellm.aclient_session is _client:
+        litellm.aclient_session = None
+    await _client.aclose()
+    _client = None
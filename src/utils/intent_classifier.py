@@ -0,0 +1,60 @@
+"""
+Keyword-based intent classifier used to skip the Analysis Agent on clear-cut queries.
+"""
+
+import re
+from typing import Any, Dict, Tuple
+
+# Greeting/thanks-only queries
+_GREETING_RE = re.compile(r"^\s*(hi|hello|chào|xin chào|cảm ơn|cám ơn|bye)\b", re.IGNORECASE)
+# Any purchase verb sends the query to the Analysis Agent, which decides between an order
+# ("Tôi muốn mua iPhone 15, còn hàng không?"), a negated or cancelled one ("chưa muốn đặt
+# hàng", "hủy order") and a question; only stock/price queries without one are fast-pathed
+_ORDER_RE = re.compile(r"\bmua\b|\blấy\b|\bđặt\b|\bchốt\b|lên đơn|đơn hàng|\border\b", re.IGNORECASE)
+_INVENTORY_RE = re.compile(
+    r"tồn kho|\bkho\b|còn hàng|hết hàng|có hàng|còn không|còn ko|\bgiá\b|bao nhiêu tiền|inventory|\bprice\b",
+    re.IGNORECASE
+)
+_PRODUCT_RE = re.compile(r"iphone|ipad|macbook|airpods|apple watch|samsung|galaxy", re.IGNORECASE)
+_SIDE_QUESTION_RE = re.compile(r"so sánh|nên mua|tư vấn|khác gì|bảo hành|trả góp", re.IGNORECASE)
+
+
+def classify_intent(query: str) -> Tuple[Dict[str, Any], float]:
+    """
+    Classify a customer query without calling the LLM.
+
+    Returns:
+        Tuple of (analysis_data, confidence). `analysis_data` has the same fields as
+        the Analysis Agent output; confidence is 0.0 when the query should go to the agent.
+    """
+    analysis_data = {
+        "product_details": query.strip(),
+        "customer_intent": "general_query",
+        "original_query": query,
+        "requires_inventory_check": False,
+        "requires_order_placement": False,
+        "depends_on_inventory": True,
+    }
+
+    has_product = _PRODUCT_RE.search(query) is not None
+    wants_order = _ORDER_RE.search(query) is not None
+    wants_inventory = _INVENTORY_RE.search(query) is not None
+
+    if _SIDE_QUESTION_RE.search(query):
+        return analysis_data, 0.0
+
+    if not (has_product or wants_order or wants_inventory):
+        if _GREETING_RE.match(query):
+            analysis_data["product_details"] = ""
+            return analysis_data, 0.95
+        return analysis_data, 0.0
+
+    if not has_product or wants_order:
+        return analysis_data, 0.0
+
+    if wants_inventory:
+        analysis_data["customer_intent"] = "check_inventory_price"
+        analysis_data["requires_inventory_check"] = True
+        return analysis_data, 0.9
+
+    return analysis_data, 0.0
@@ -0,0 +1,42 @@
+"""
+Tolerant extraction of JSON objects from LLM output.
+"""
+
+import json
+import orjson
+from typing import Any, Dict
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    Return the first JSON object embedded in `text`.
+
+    The whole string is tried first with orjson; otherwise every `{` is tried as
+    the start of an object, which skips reasoning text, markdown fences and
+    trailing commentary around the JSON.
+
+    Raises:
+        ValueError: If `text` contains no JSON object
+    """
+    stripped = text.strip() if text else ""
+    if stripped.startswith("{"):
+        try:
+            data = orjson.loads(stripped)
+            if isinstance(data, dict):
+                return data
+        except orjson.JSONDecodeError:
+            pass
+
+    start = stripped.find("{")
+    while start != -1:
+        try:
+            data, _ = _decoder.raw_decode(stripped, start)
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+        start = stripped.find("{", start + 1)
+
+    raise ValueError("No JSON object found in text")
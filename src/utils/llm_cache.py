@@ -0,0 +1,120 @@
+"""
+TTL caches for complete pipeline responses and for single agent outputs.
+"""
+
+import time
+import hashlib
+import orjson
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from src.utils.semantic_cache import SemanticCache
+
+
+class TTLCache:
+    """
+    In-process map whose entries expire after a per-entry TTL, bounded by LRU eviction.
+
+    Used for deterministic agent outputs that depend only on their prompt.
+    """
+
+    __slots__ = ("maxsize", "_entries")
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the fresh value for `key`, or None on a miss or expired entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """Store `value` for `ttl` seconds (no-op when ttl <= 0), evicting the least recently used entry when full."""
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Agents whose output must never be replayed: order creates orders, inventory quotes live stock/prices
+_UNCACHEABLE_AGENTS = frozenset(("order", "inventory"))
+
+
+def is_cacheable_response(response: Dict[str, Any]) -> bool:
+    """Only successful answers that neither placed an order nor quoted live stock/prices may be replayed."""
+    if response.get("status") != "success":
+        return False
+    return not any(output.agent in _UNCACHEABLE_AGENTS for output in response.get("agent_outputs") or ())
+
+
+class LLMCache:
+    """
+    Response cache placed in front of the multi-agent pipeline.
+
+    Entries are scoped by sha256(sorted context + user_id + session_id), so a hit
+    never crosses customers or conversations; inside a scope the query is matched exactly first and, when the
+    backend has an embedder, by cosine similarity for near-duplicate wording.
+    Tiering to Redis is left to the backend.
+    """
+
+    def __init__(self, backend: SemanticCache, ttl_seconds: int = 3600):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def make_scope(
+        context: Optional[Dict[str, Any]],
+        user_id: Optional[str],
+        session_id: Optional[str] = None,
+    ) -> str:
+        """Hash everything besides the query that changes the answer."""
+        payload = orjson.dumps(
+            {"context": context or {}, "user_id": user_id or "", "session_id": session_id or ""},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return hashlib.sha256(payload).hexdigest()
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get(
+        self,
+        query: str,
+        context: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> Optional[Any]:
+        """Return the cached response for `query`, or None on a miss or expired entry."""
+        entry = self.backend.get(self._normalize(query), self.make_scope(context, user_id, session_id))
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if time.monotonic() >= expires_at:
+            return None
+        return response
+
+    def set(
+        self,
+        query: str,
+        response: Any,
+        context: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ):
+        """Store `response` for `query` for `ttl_seconds`."""
+        self.backend.set(
+            self._normalize(query),
+            (time.monotonic() + self.ttl_seconds, response),
+            self.make_scope(context, user_id, session_id),
+        )
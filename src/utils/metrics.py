@@ -3,24 +3,36 @@ Monitoring and metrics tracking for the multi-agent system.
 """
 
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter
 from loguru import logger
 
 
 class MetricsCollector:
     """Collect and track system metrics."""
     
+    __slots__ = (
+        "request_count", "success_count", "error_count", "total_response_time",
+        "total_tokens_used", "requests_by_intent", "errors_by_type", "cache_hits",
+        "cache_misses", "classifier_hits", "classifier_misses", "start_time", "_start_ns",
+    )
+    
     def __init__(self):
         self.request_count = 0
         self.success_count = 0
         self.error_count = 0
         self.total_response_time = 0.0
         self.total_tokens_used = 0
-        self.requests_by_intent = defaultdict(int)
-        self.errors_by_type = defaultdict(int)
+        self.requests_by_intent = Counter()
+        self.errors_by_type = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.classifier_hits = 0
+        self.classifier_misses = 0
         self.start_time = datetime.now()
+        # Uptime comes from the monotonic clock, unaffected by wall-clock adjustments
+        self._start_ns = time.monotonic_ns()
         
     def record_request(
         self,
@@ -57,6 +69,49 @@ class MetricsCollector:
         if tokens_used:
             self.total_tokens_used += tokens_used
     
+    def record_batch(
+        self,
+        *,
+        successes: int,
+        errors: int,
+        response_time_sum: float,
+        intents: Iterable[str] = (),
+        error_types: Iterable[str] = (),
+        tokens: int = 0
+    ):
+        """
+        Record several requests at once.
+        
+        Args:
+            successes: Number of successful requests
+            errors: Number of failed requests
+            response_time_sum: Summed response time in seconds
+            intents: Customer intents, one per request that has one
+            error_types: Error types, one per failed request that has one
+            tokens: Total number of tokens used
+        """
+        self.request_count += successes + errors
+        self.success_count += successes
+        self.error_count += errors
+        self.total_response_time += response_time_sum
+        self.total_tokens_used += tokens
+        self.requests_by_intent.update(intents)
+        self.errors_by_type.update(error_types)
+    
+    def record_cache(self, hit: bool):
+        """Record a response cache lookup."""
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+    
+    def record_classifier(self, hit: bool):
+        """Record whether the intent classifier could skip the Analysis Agent."""
+        if hit:
+            self.classifier_hits += 1
+        else:
+            self.classifier_misses += 1
+    
     def get_metrics(self) -> Dict[str, Any]:
         """
         Get current metrics.
@@ -64,7 +119,7 @@ class MetricsCollector:
         Returns:
             Dictionary of current metrics
         """
-        uptime = (datetime.now() - self.start_time).total_seconds()
+        uptime = (time.monotonic_ns() - self._start_ns) / 1e9
         avg_response_time = (
             self.total_response_time / self.request_count 
             if self.request_count > 0 
@@ -86,7 +141,11 @@ class MetricsCollector:
             "total_tokens_used": self.total_tokens_used,
             "requests_per_minute": round(self.request_count / (uptime / 60), 2) if uptime > 0 else 0,
             "requests_by_intent": dict(self.requests_by_intent),
-            "errors_by_type": dict(self.errors_by_type)
+            "errors_by_type": dict(self.errors_by_type),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "classifier_hits": self.classifier_hits,
+            "classifier_misses": self.classifier_misses
         }
     
     def reset(self):
@@ -102,30 +161,34 @@ class MetricsCollector:
 class RequestTimer:
     """Context manager for timing requests."""
     
+    __slots__ = ("name", "_start_ns", "elapsed")
+    
     def __init__(self, name: str = "request"):
         self.name = name
-        self.start_time = None
-        self.end_time = None
+        self._start_ns = None
         self.elapsed = None
     
     def __enter__(self):
-        self.start_time = time.time()
+        self._start_ns = time.perf_counter_ns()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.end_time = time.time()
-        self.elapsed = self.end_time - self.start_time
+        self.elapsed = (time.perf_counter_ns() - self._start_ns) * 1e-9
         
         if exc_type is None:
-            logger.debug(f"⏱️ {self.name} completed in {self.elapsed:.3f}s")
+            logger.opt(lazy=True).debug("⏱️ {} completed in {}s", lambda: self.name, lambda: f"{self.elapsed:.3f}")
         else:
             logger.warning(f"⏱️ {self.name} failed after {self.elapsed:.3f}s")
         
         return False  # Don't suppress exceptions
     
     def get_elapsed(self) -> float:
-        """Get elapsed time in seconds."""
-        return self.elapsed if self.elapsed is not None else 0.0
+        """Get elapsed time in seconds (time so far while still running)."""
+        if self.elapsed is not None:
+            return self.elapsed
+        if self._start_ns is None:
+            return 0.0
+        return (time.perf_counter_ns() - self._start_ns) * 1e-9
 
 
 # Global metrics collector instance
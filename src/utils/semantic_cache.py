@@ -0,0 +1,113 @@
+"""
+Response cache that also matches paraphrased keys via sentence embeddings.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+from loguru import logger
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
+
+
+class SemanticCache:
+    """
+    LRU cache keyed by text, with a cosine-similarity fallback on misses.
+
+    Every entry belongs to a `scope`: a lookup only matches entries stored under
+    the same scope, so callers put whatever must match exactly (tool results,
+    customer info) into the scope and the free-form text into `text`.
+    Without sentence-transformers installed (or with `model_name=None`) the cache
+    only does exact matching.
+    """
+
+    def __init__(self, model_name: Optional[str], threshold: float = 0.95, maxsize: int = 10_000):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._exact: OrderedDict[str, Any] = OrderedDict()
+
+        self._encoder = None
+        if model_name is None:
+            pass
+        elif SentenceTransformer is None:
+            logger.warning("sentence-transformers not installed, semantic cache uses exact matching only")
+        else:
+            try:
+                self._encoder = SentenceTransformer(model_name)
+                logger.info(f"Semantic cache embedder loaded: {model_name}")
+            except Exception as e:
+                logger.warning(f"Failed to load embedder {model_name}, using exact matching only: {e}")
+
+        # Ring buffer of normalized embeddings; row i is described by self._entries[i]
+        self._matrix = None
+        self._entries: list[Optional[tuple[str, Any]]] = [None] * maxsize
+        self._size = 0
+        self._next = 0
+
+    @property
+    def semantic(self) -> bool:
+        """Whether similarity lookups are available."""
+        return self._encoder is not None
+
+    def _embed(self, text: str):
+        return self._encoder.encode([text], normalize_embeddings=True)[0].astype(np.float32)
+
+    def get(self, text: str, scope: str = "") -> Optional[Any]:
+        """Return the cached value for `text` (or a close paraphrase) within `scope`."""
+        key = f"{scope}\x00{text}"
+        with self._lock:
+            if key in self._exact:
+                self._exact.move_to_end(key)
+                return self._exact[key]
+
+        if self._encoder is None:
+            return None
+
+        embedding = self._embed(text)
+        with self._lock:
+            if self._size == 0:
+                return None
+            # Inner product of unit vectors == cosine similarity
+            scores = self._matrix[:self._size] @ embedding
+            for idx in np.argsort(scores)[::-1][:8]:
+                if scores[idx] < self.threshold:
+                    break
+                entry_scope, value = self._entries[idx]
+                if entry_scope == scope:
+                    return value
+        return None
+
+    def set(self, text: str, value: Any, scope: str = ""):
+        """Store `value` for `text` within `scope`."""
+        key = f"{scope}\x00{text}"
+        embedding = self._embed(text) if self._encoder is not None else None
+
+        with self._lock:
+            self._exact[key] = value
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.maxsize:
+                self._exact.popitem(last=False)
+
+            if embedding is None:
+                return
+            if self._matrix is None:
+                self._matrix = np.zeros((self.maxsize, embedding.shape[0]), dtype=np.float32)
+            # Overwrite the oldest row once the buffer is full
+            self._matrix[self._next] = embedding
+            self._entries[self._next] = (scope, value)
+            self._next = (self._next + 1) % self.maxsize
+            self._size = min(self._size + 1, self.maxsize)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._exact.clear()
+            self._entries = [None] * self.maxsize
+            self._size = 0
+            self._next = 0